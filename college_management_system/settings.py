@@ -166,6 +166,43 @@ EMAIL_USE_TLS = True
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Firebase Cloud Messaging (legacy HTTP API), used by main_app.push_dispatcher.
+# Point FCM_SEND_URL at a local stub server to exercise pushes without Google.
+FCM_SEND_URL = os.environ.get('FCM_SEND_URL', 'https://fcm.googleapis.com/fcm/send')
+FCM_SERVER_KEY = os.environ.get('FCM_SERVER_KEY', '')  # pushes are skipped while unset
+FCM_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+FCM_MAX_RETRIES = 3
+
+# Chat assistant AI fallback, see main_app.ai_gateway.
+# Set CHAT_AI_BACKEND=main_app.ai_gateway.FakeBackend to run without Gemini.
+CHAT_AI_BACKEND = os.environ.get('CHAT_AI_BACKEND', 'main_app.ai_gateway.GeminiBackend')
+CHAT_AI_DEADLINE = 8.0  # seconds a request waits before the default response
+CHAT_AI_MAX_CONCURRENCY = 4
+CHAT_AI_FAILURE_THRESHOLD = 3
+CHAT_AI_COOLDOWN = 60.0
+
+# One cache shared by every process (web workers, process_notifications,
+# process_imports). Dashboard stats, cached chat answers and SystemSettings are
+# invalidated through it, so a per-process LocMemCache would leave the other
+# processes stale. Set REDIS_URL to use Redis, as production should; otherwise
+# the database table created by `python manage.py createcachetable`, at one
+# query per cache read.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'main_app_cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
 prod_db = dj_database_url.config(conn_max_age=500)
 DATABASES['default'].update(prod_db)
 
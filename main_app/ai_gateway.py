@@ -0,0 +1,234 @@
+# main_app/ai_gateway.py
+"""Bounded, cached access to the generative AI fallback of the chat assistant.
+
+``get_gateway().ask(role, question, api_key)`` returns the model's answer, or
+None when the caller should use ``chat_default_response`` instead. A request
+worker is never held for longer than ``CHAT_AI_DEADLINE`` seconds:
+
+* calls run on a small thread pool. At most ``CHAT_AI_MAX_CONCURRENCY`` are
+  in flight; when all slots are taken, the caller gets the fallback
+  immediately instead of queueing.
+* after ``CHAT_AI_FAILURE_THRESHOLD`` consecutive failures or timeouts, the
+  circuit opens for ``CHAT_AI_COOLDOWN`` seconds. Then a single trial call
+  decides whether it closes again.
+* answers are cached per (role, normalised question) in an in-process
+  LRU/TTL cache, so repeated generic questions cost nothing.
+
+The backend is ``settings.CHAT_AI_BACKEND``; ``FakeBackend`` answers offline
+for tests and local development.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PROMPT = (
+    "You are a helpful assistant for a College Management System. "
+    "The user is a {role}. "
+    "Be concise and helpful. If asked about specific college data, "
+    "politely direct them to use the appropriate system features. "
+    "Answer the following question: {question}"
+)
+
+
+def normalize_question(question):
+    return re.sub(r'\s+', ' ', question.lower()).strip(' ?!.')
+
+
+class GeminiBackend:
+    """Google Gemini through google.generativeai; unavailable when it is not installed."""
+
+    model_name = 'gemini-pro'
+
+    def __init__(self):
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            genai = None
+        self.genai = genai
+        self.available = genai is not None
+        self._lock = threading.Lock()
+        self._api_key = None
+        self._model = None
+
+    def generate(self, prompt, api_key, timeout):
+        genai = self.genai
+        with self._lock:
+            if self._model is None or api_key != self._api_key:
+                genai.configure(api_key=api_key)  # process-wide, so only on key change
+                self._model = genai.GenerativeModel(self.model_name)
+                self._api_key = api_key
+            model = self._model
+        return model.generate_content(prompt, request_options={'timeout': timeout}).text
+
+
+class FakeBackend:
+    """Offline stand-in: echoes the question after an optional delay."""
+
+    available = True
+
+    def __init__(self, reply="[fake AI] {question}", delay=0, error=None):
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def generate(self, prompt, api_key, timeout):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.reply.format(question=prompt.rsplit(': ', 1)[-1])
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_running:
+                return False
+            self._trial_running = True  # half-open: let one call through
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                if self._opened_at is None:
+                    logger.warning("AI gateway circuit opened after %s failures", self._failures)
+                self._opened_at = time.monotonic()
+
+
+class AIGateway:
+    def __init__(self, backend, deadline=8.0, max_concurrency=4, failure_threshold=3,
+                 cooldown=60.0, cache_size=256, cache_ttl=600.0):
+        self.backend = backend
+        self.deadline = deadline
+        self.breaker = CircuitBreaker(failure_threshold, cooldown)
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='ai-gateway')
+
+    def ask(self, role, question, api_key):
+        """Return the answer text, or None to fall back to the default response."""
+        if not self.backend.available:
+            return None
+        key = (role, normalize_question(question))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if not self._slots.acquire(blocking=False):
+            logger.info("AI gateway busy; using the default response")
+            return None
+        if not self.breaker.allow():
+            self._slots.release()
+            return None
+
+        prompt = PROMPT.format(role=role, question=key[1])
+        try:
+            future = self._executor.submit(self.backend.generate, prompt, api_key, self.deadline)
+        except RuntimeError:
+            self._slots.release()
+            return None
+        # The slot stays taken until the call really ends, even past the deadline
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            answer = future.result(timeout=self.deadline)
+        except TimeoutError:
+            logger.warning("AI gateway call exceeded %.1fs deadline", self.deadline)
+            self.breaker.record_failure()
+            return None
+        except Exception as exc:  # noqa: BLE001
+            logger.error("AI gateway error: %s", exc)
+            self.breaker.record_failure()
+            return None
+
+        self.breaker.record_success()
+        if answer:
+            self.cache.set(key, answer)
+        return answer or None
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Process-wide gateway built from the CHAT_AI_* settings."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            backend = import_string(getattr(settings, 'CHAT_AI_BACKEND', 'main_app.ai_gateway.GeminiBackend'))()
+            _gateway = AIGateway(
+                backend,
+                deadline=getattr(settings, 'CHAT_AI_DEADLINE', 8.0),
+                max_concurrency=getattr(settings, 'CHAT_AI_MAX_CONCURRENCY', 4),
+                failure_threshold=getattr(settings, 'CHAT_AI_FAILURE_THRESHOLD', 3),
+                cooldown=getattr(settings, 'CHAT_AI_COOLDOWN', 60.0),
+            )
+    return _gateway
+
+
+def set_gateway(gateway):
+    """Replace the active gateway (e.g. one built on FakeBackend); returns the previous one."""
+    global _gateway
+    with _gateway_lock:
+        previous, _gateway = _gateway, gateway
+    return previous
@@ -1,6 +1,18 @@
 # main_app/apps.py
+from importlib import import_module
+
 from django.apps import AppConfig
 
+# Modules that connect signal receivers when imported
+SIGNAL_MODULES = (
+    'models',
+    'notification_service',
+    'dashboard_stats',
+    'push_dispatcher',
+    'broadcast',
+    'chat_cache',
+)
+
 
 class MainAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -8,11 +20,6 @@ class MainAppConfig(AppConfig):
 
     def ready(self):
         # Import models **after** registry is ready
-        try:
-            from . import models               # noqa: F401
-            from . import notification_service # noqa: F401
-        except ImportError:
-            # If circular import happens, import lazily
-            from django.utils.module_loading import import_string
-            import_string('main_app.models')
-            import_string('main_app.notification_service')
\ No newline at end of file
+        for module in SIGNAL_MODULES:
+            import_module(f'{self.name}.{module}')
+        import_module(f'{self.name}.checks')
@@ -0,0 +1,93 @@
+# main_app/attendance_counters.py
+"""Maintain the StudentSubjectAttendance counters alongside AttendanceReport.
+
+The helpers here only issue set-based UPDATEs; callers are expected to run
+them inside the same ``transaction.atomic()`` block that writes the reports,
+so the counters never drift from the report rows.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .chat_cache import student_topic_changed, topic_changed
+from .dashboard_stats import invalidate_dashboard_stats
+from .models import AttendanceReport, StudentSubjectAttendance
+
+
+def _ensure_rows(subject_id, student_ids):
+    StudentSubjectAttendance.objects.bulk_create(
+        [StudentSubjectAttendance(student_id=sid, subject_id=subject_id) for sid in student_ids],
+        ignore_conflicts=True,
+    )
+
+
+def record_new_reports(subject_id, present_ids=(), absent_ids=()):
+    """Count freshly inserted reports for one subject."""
+    present_ids, absent_ids = set(present_ids), set(absent_ids)
+    if not present_ids and not absent_ids:
+        return
+    _ensure_rows(subject_id, present_ids | absent_ids)
+    rows = StudentSubjectAttendance.objects.filter(subject_id=subject_id)
+    if present_ids:
+        rows.filter(student_id__in=present_ids).update(present=F('present') + 1)
+    if absent_ids:
+        rows.filter(student_id__in=absent_ids).update(absent=F('absent') + 1)
+    student_topic_changed('attendance', present_ids | absent_ids)
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+def record_status_changes(subject_id, now_present_ids=(), now_absent_ids=()):
+    """Move counts between present/absent for reports whose status flipped."""
+    now_present_ids, now_absent_ids = set(now_present_ids), set(now_absent_ids)
+    if not now_present_ids and not now_absent_ids:
+        return
+    _ensure_rows(subject_id, now_present_ids | now_absent_ids)
+    rows = StudentSubjectAttendance.objects.filter(subject_id=subject_id)
+    if now_present_ids:
+        rows.filter(student_id__in=now_present_ids).update(
+            present=F('present') + 1, absent=F('absent') - 1)
+    if now_absent_ids:
+        rows.filter(student_id__in=now_absent_ids).update(
+            present=F('present') - 1, absent=F('absent') + 1)
+    student_topic_changed('attendance', now_present_ids | now_absent_ids)
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+def rebuild_attendance_counters(batch_size=1000):
+    """Recompute every counter row from AttendanceReport; returns rows written."""
+    grouped = (
+        AttendanceReport.objects
+        .values('student_id', 'attendance__subject_id')
+        .annotate(present=Count('id', filter=Q(status=True)),
+                  absent=Count('id', filter=Q(status=False)))
+        .order_by()
+    )
+    with transaction.atomic():
+        rows = [
+            StudentSubjectAttendance(
+                student_id=row['student_id'],
+                subject_id=row['attendance__subject_id'],
+                present=row['present'],
+                absent=row['absent'],
+            )
+            for row in grouped
+        ]
+        StudentSubjectAttendance.objects.all().delete()
+        StudentSubjectAttendance.objects.bulk_create(rows, batch_size=batch_size)
+        topic_changed('attendance')
+        transaction.on_commit(invalidate_dashboard_stats)
+    return len(rows)
+
+
+def student_attendance_by_subject(student):
+    """Return {subject_id: StudentSubjectAttendance} for one student."""
+    return {
+        row.subject_id: row
+        for row in StudentSubjectAttendance.objects.filter(student=student)
+    }
+
+
+def student_attendance_totals(student):
+    """Return (present, absent) summed over all of a student's subjects."""
+    totals = StudentSubjectAttendance.objects.filter(student=student).aggregate(
+        present=Sum('present'), absent=Sum('absent'))
+    return totals['present'] or 0, totals['absent'] or 0
@@ -0,0 +1,130 @@
+# main_app/broadcast.py
+"""Announcements to every student and/or staff member matching a filter.
+
+``queue_broadcast()`` creates a Broadcast progress row and one outbox row.
+The ``process_notifications`` worker splits the audience into
+``BROADCAST_CHUNK_SIZE`` chunks, each queued as its own outbox row, and
+queues the FCM pushes as single course/session-wide sends. Each chunk
+writes its NotificationStudent / NotificationStaff and DashboardNotification
+rows with ``bulk_create`` and raises Broadcast.sent in the same commit, so
+the admin page polling any web process sees progress as chunks land, and a
+failing chunk is retried on its own.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+
+from .models import (Broadcast, CustomUser, NotificationOutbox, NotificationStaff,
+                     NotificationStudent, Staff, Student)
+from .notification_outbox import enqueue, outbox_handler
+from .notification_service import NotificationService
+from .push_dispatcher import queue_push
+
+BROADCAST_CHUNK_SIZE = 500
+
+ROLES = ('student', 'staff', 'all')
+# chunk kind -> (notification model, profile field)
+CHUNK_MODELS = {
+    'student': (NotificationStudent, 'student_id'),
+    'staff': (NotificationStaff, 'staff_id'),
+}
+
+
+def broadcast_students(role, course_id=None, session_id=None):
+    if role not in ('student', 'all'):
+        return Student.objects.none()
+    students = Student.objects.filter(admin__is_active=True)
+    if course_id:
+        students = students.filter(course_id=course_id)
+    if session_id:
+        students = students.filter(session_id=session_id)
+    return students
+
+
+def broadcast_staff(role, course_id=None, session_id=None):
+    # Staff are not enrolled in sessions, so a session filter leaves them out
+    if role not in ('staff', 'all') or session_id:
+        return Staff.objects.none()
+    staff = Staff.objects.filter(admin__is_active=True)
+    if course_id:
+        staff = staff.filter(course_id=course_id)
+    return staff
+
+
+def get_progress(broadcast_id):
+    """Return {'status', 'total', 'sent'}, or None for an unknown broadcast."""
+    progress = Broadcast.objects.filter(pk=broadcast_id).first()
+    if progress is None:
+        return None
+    if progress.status == Broadcast.QUEUED:
+        status = 'queued'
+    elif progress.sent >= progress.total:
+        status = 'done'
+    else:
+        status = 'running'
+    if status != 'done' and NotificationOutbox.objects.filter(
+            status=NotificationOutbox.FAILED, event__in=('broadcast', 'broadcast_chunk'),
+            payload__broadcast_id=progress.pk).exists():
+        status = 'failed'
+    return {'status': status, 'total': progress.total, 'sent': progress.sent}
+
+
+def queue_broadcast(message, role, course_id=None, session_id=None, sender=None):
+    """Queue the broadcast; returns (broadcast_id, number of recipients).
+
+    Nothing is queued when no one matches, and the id is then None.
+    """
+    total = (broadcast_students(role, course_id, session_id).count()
+             + broadcast_staff(role, course_id, session_id).count())
+    if not total:
+        return None, 0
+    with transaction.atomic():
+        progress = Broadcast.objects.create(total=total)
+        enqueue(
+            'broadcast', broadcast_id=progress.pk, message=message, role=role,
+            course_id=course_id, session_id=session_id,
+            sender_id=sender.pk if sender else None,
+        )
+    return progress.pk, total
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+@outbox_handler('broadcast')
+def broadcast(broadcast_id, message, role, course_id=None, session_id=None, sender_id=None):
+    students = list(broadcast_students(role, course_id, session_id).values_list('id', 'admin_id'))
+    staff = list(broadcast_staff(role, course_id, session_id).values_list('id', 'admin_id'))
+    for kind, recipients in (('student', students), ('staff', staff)):
+        for chunk in _chunks(recipients, BROADCAST_CHUNK_SIZE):
+            enqueue('broadcast_chunk', broadcast_id=broadcast_id, kind=kind, recipients=chunk,
+                    message=message, sender_id=sender_id)
+    Broadcast.objects.filter(pk=broadcast_id).update(
+        status=Broadcast.RUNNING, total=len(students) + len(staff))
+
+    if students:
+        queue_push(message, click_action=reverse('student_view_notification'),
+                   user_type='3', course_id=course_id, session_id=session_id)
+    if staff:
+        queue_push(message, click_action=reverse('staff_view_notification'),
+                   user_type='2', course_id=course_id)
+
+
+@outbox_handler('broadcast_chunk')
+def broadcast_chunk(broadcast_id, kind, recipients, message, sender_id=None):
+    """Notify one chunk of (profile id, user id) pairs."""
+    model, field = CHUNK_MODELS[kind]
+    sender = CustomUser.objects.filter(pk=sender_id).first() if sender_id else None
+    model.objects.bulk_create([model(**{field: profile_id}, message=message)
+                               for profile_id, _ in recipients])
+    NotificationService.fan_out(
+        [admin_id for _, admin_id in recipients],
+        notification_type='admin_notification',
+        title="Admin Notification",
+        message=message,
+        sender=sender,
+        fail_silently=False,
+    )
+    Broadcast.objects.filter(pk=broadcast_id).update(sent=F('sent') + len(recipients))
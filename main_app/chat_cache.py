@@ -0,0 +1,135 @@
+# main_app/chat_cache.py
+"""Per-(user, intent) cache for the data-backed chat answers.
+
+The preset buttons send the same few questions again and again; the cached
+answer is served without touching the database. Each intent depends on a few
+topics. A topic has a version number per user and one for everybody, and
+each cached answer is stamped with all of them. Bumping a version on write
+therefore invalidates exactly the answers built from the old data, without
+having to enumerate keys. The versions live in the shared default cache (see
+CACHES in settings), so a write in any process invalidates the answers in all
+of them. The versions and the answer are read in one get_many, which is a
+single query on the database cache.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+CHAT_ANSWER_KEY = 'main_app:chat_answer:{}:{}'   # user id, intent
+CHAT_VERSION_KEY = 'main_app:chat_version:{}:{}'  # topic, user id or 'all'
+CHAT_ANSWER_TIMEOUT = 600  # seconds; also bounds staleness of untracked fields such as names
+
+# Topics an intent's answer is built from, for every role
+INTENT_TOPICS = {
+    'attendance': ('attendance', 'academic'),  # staff get their subject list
+    'results': ('results', 'academic'),
+    'academic': ('academic',),
+    'session': ('session', 'roster'),  # HOD sees student counts per session
+}
+
+
+def _version_keys(user_id, topics):
+    keys = [CHAT_VERSION_KEY.format('profile', user_id)]
+    for topic in topics:
+        keys.append(CHAT_VERSION_KEY.format(topic, 'all'))
+        keys.append(CHAT_VERSION_KEY.format(topic, user_id))
+    return keys
+
+
+def _stamp(keys, found):
+    """Join the versions of `keys`, starting any version missing from `found`."""
+    for key in keys:
+        if key not in found:
+            version = time.time_ns()
+            # Versions never expire; add() keeps a concurrent writer's value
+            found[key] = version if cache.add(key, version, None) else cache.get(key)
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def cached_answer(user, intent, build):
+    """Return build(user), cached until one of the intent's topics changes."""
+    topics = INTENT_TOPICS.get(intent)
+    if topics is None:
+        return build(user)
+    version_keys = _version_keys(user.id, topics)
+    key = CHAT_ANSWER_KEY.format(user.id, intent)
+    found = cache.get_many(version_keys + [key])
+    cached = found.pop(key, None)
+    stamp = _stamp(version_keys, found)
+    if cached is not None and cached['versions'] == stamp:
+        return cached['answer']
+    answer = build(user)
+    if answer.get('type') != 'error':
+        cache.set(key, {'versions': stamp, 'answer': answer}, CHAT_ANSWER_TIMEOUT)
+    return answer
+
+
+def _bump(key):
+    # set() rather than incr(): incr re-stores the value with the default
+    # timeout on the database cache, so the version would expire
+    cache.set(key, time.time_ns(), None)
+
+
+def topic_changed(topic, user_ids=None):
+    """Invalidate answers built from `topic` for these users (all users if None), on commit."""
+    if user_ids is None:
+        keys = [CHAT_VERSION_KEY.format(topic, 'all')]
+    else:
+        keys = [CHAT_VERSION_KEY.format(topic, uid) for uid in set(user_ids)]
+
+    def commit():
+        for key in keys:
+            _bump(key)
+    transaction.on_commit(commit)
+
+
+def student_topic_changed(topic, student_ids):
+    """Like topic_changed, for Student primary keys."""
+    from .models import Student
+    student_ids = set(student_ids)
+    if student_ids:
+        topic_changed(topic, Student.objects.filter(id__in=student_ids).values_list('admin_id', flat=True))
+
+
+def _student_rows_changed(topic):
+    def receiver(sender, instance, **kwargs):
+        if 'created' in kwargs:
+            student_topic_changed(topic, [instance.student_id])
+        else:
+            # Deletes mostly arrive as cascades, one signal per row; skip the lookups
+            topic_changed(topic)
+    return receiver
+
+
+def _profile_changed(sender, instance, **kwargs):
+    topic_changed('profile', [instance.admin_id])
+    topic_changed('roster' if sender.__name__ == 'Student' else 'academic')
+
+
+def _academic_changed(sender, instance, **kwargs):
+    topic_changed('academic')
+
+
+def _session_changed(sender, instance, **kwargs):
+    topic_changed('session')
+
+
+_RECEIVERS = (
+    ('AttendanceReport', _student_rows_changed('attendance')),
+    ('StudentResult', _student_rows_changed('results')),
+    ('Student', _profile_changed),
+    ('Staff', _profile_changed),
+    ('Course', _academic_changed),
+    ('Subject', _academic_changed),
+    ('Session', _session_changed),
+)
+
+for _model_name, _receiver in _RECEIVERS:
+    for _label, _signal in (('save', post_save), ('delete', post_delete)):
+        _signal.connect(
+            _receiver,
+            sender=f'main_app.{_model_name}',
+            dispatch_uid=f'chat_cache_{_label}_{_model_name}',
+        )
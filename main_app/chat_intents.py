@@ -0,0 +1,104 @@
+# main_app/chat_intents.py
+"""Keyword intent routing for the chat assistant.
+
+Each role has an ordered list of (intent, keywords) rules; earlier rules win,
+mirroring the if/elif chains they replace. A router compiles all of a role's
+keywords into one regex at import time and finds the best intent in a single
+pass over the message. Keywords only match whole words, so 'hi' no longer
+fires on 'this'. Single-word keywords of four or more letters also accept
+a plural 's' ('notifications', 'results').
+"""
+import re
+
+PLURAL_MIN_LENGTH = 4
+
+
+def _keyword_pattern(keyword):
+    pattern = re.escape(keyword)
+    if ' ' not in keyword and len(keyword) >= PLURAL_MIN_LENGTH:
+        pattern += 's?'
+    return pattern
+
+
+class IntentRouter:
+    """Route a lower-cased message to the highest-priority matching intent."""
+
+    def __init__(self, rules):
+        self.intents = [intent for intent, _ in rules]
+        self._check_shadowing(rules)
+        # At each position the alternatives are tried in rule order
+        groups = [
+            f"(?P<r{rank}>{'|'.join(_keyword_pattern(k) for k in sorted(keywords, key=len, reverse=True))})"
+            for rank, (_, keywords) in enumerate(rules)
+        ]
+        self.pattern = re.compile(r'\b(?:' + '|'.join(groups) + r')\b')
+
+    @staticmethod
+    def _check_shadowing(rules):
+        """Matches do not overlap, so a phrase must not hide a higher-priority word.
+
+        e.g. 'total students' (rank 3) would consume 'students' (rank 1) and
+        route the message to the lower-priority intent.
+        """
+        for rank, (intent, keywords) in enumerate(rules):
+            for keyword in keywords:
+                for other_intent, others in rules[:rank]:
+                    for other in others:
+                        if re.search(r'\s' + re.escape(other) + r'\b', keyword):
+                            raise ValueError(
+                                f"'{keyword}' ({intent}) hides '{other}' ({other_intent})")
+
+    def route(self, message):
+        """Return the intent name, or None when nothing matches."""
+        best = None
+        for match in self.pattern.finditer(message):
+            rank = int(match.lastgroup[1:])
+            if best is None or rank < best:
+                best = rank
+                if rank == 0:
+                    break
+        return None if best is None else self.intents[best]
+
+
+PROFILE = ('profile', ['profile', 'my info', 'my details', 'who am i'])
+SESSION = ('session', ['session', 'academic year', 'year'])
+NOTIFICATIONS = ('notifications', ['notification', 'alert', 'message'])
+HELP = ('help', ['help', 'assist', 'support'])
+GREETING = ('greeting', ['hello', 'hi', 'hey'])
+
+ADMIN_RULES = [
+    PROFILE,
+    ('overview', ['overview', 'dashboard', 'summary', 'system']),
+    ('student_count', ['students', 'student count', 'total students']),
+    ('staff_count', ['staff', 'teachers', 'faculty count']),
+    SESSION,
+    HELP,
+    GREETING,
+]
+
+STAFF_RULES = [
+    PROFILE,
+    ('attendance', ['attendance', 'my attendance']),
+    ('academic', ['subjects', 'courses', 'what i teach', 'academic']),
+    SESSION,
+    NOTIFICATIONS,
+    ('leave', ['leave', 'time off']),
+    HELP,
+    GREETING,
+]
+
+STUDENT_RULES = [
+    PROFILE,
+    ('attendance', ['attendance', 'my attendance']),
+    ('results', ['result', 'grade', 'marks', 'score', 'performance']),
+    ('academic', ['subjects', 'courses', 'my subjects', 'academic', 'subject']),
+    ('session', ['session', 'academic year', 'year', 'semester', 'term']),
+    NOTIFICATIONS,
+    ('leave', ['leave', 'time off', 'vacation']),
+    ('help', ['help', 'assist', 'support', 'what can you do']),
+    GREETING,
+]
+
+ADMIN_INTENTS = IntentRouter(ADMIN_RULES)
+STAFF_INTENTS = IntentRouter(STAFF_RULES)
+STUDENT_INTENTS = IntentRouter(STUDENT_RULES)
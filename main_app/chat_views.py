@@ -1,25 +1,27 @@
 import json
 import logging
+from django.db.models import Count
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from .models import (
-    Student, Staff, Admin, Attendance, AttendanceReport,
+    CustomUser, Student, Staff, Admin,
     NotificationStudent, NotificationStaff, Subject, Course, 
     Session, SystemSettings, LeaveReportStudent, LeaveReportStaff,
     StudentResult
 )
-
-try:
-    import google.generativeai as genai
-    HAS_GEMINI = True
-except ImportError:
-    HAS_GEMINI = False
+from .attendance_counters import student_attendance_totals
+from .chat_intents import ADMIN_INTENTS, STAFF_INTENTS, STUDENT_INTENTS
+from .ai_gateway import get_gateway
+from .chat_cache import cached_answer
 
 logger = logging.getLogger(__name__)
 
+# user_type is stored as a string, so get_user_type_display() returns '1'/'2'/'3'
+ROLE_NAMES = {'1': 'Admin', '2': 'Staff', '3': 'Student'}
+
 class EnhancedChatService:
     def __init__(self):
-        self.system_settings = SystemSettings.objects.first()
+        self.system_settings = SystemSettings.get_cached()
     
     def process_message(self, user, message):
         """Enhanced message processing with strict access control"""
@@ -58,34 +60,35 @@ class EnhancedChatService:
     
     def handle_admin_queries(self, user, message):
         """Handle admin-specific queries"""
+        intent = ADMIN_INTENTS.route(message)
         
         # Profile information
-        if any(word in message for word in ['profile', 'my info', 'my details', 'who am i']):
+        if intent == 'profile':
             return self.get_enhanced_profile_info(user)
         
         # System overview
-        elif any(word in message for word in ['overview', 'dashboard', 'summary', 'system']):
+        elif intent == 'overview':
             return self.get_system_overview()
         
         # User management
-        elif any(word in message for word in ['students', 'student count', 'total students']):
+        elif intent == 'student_count':
             count = Student.objects.count()
             return {"message": f"📊 **Total Students:** {count}", "type": "info"}
         
-        elif any(word in message for word in ['staff', 'teachers', 'faculty count']):
+        elif intent == 'staff_count':
             count = Staff.objects.count()
             return {"message": f"📊 **Total Staff:** {count}", "type": "info"}
         
         # Session info - FIXED
-        elif any(word in message for word in ['session', 'academic year', 'year']):
-            return self.get_session_info(user)
+        elif intent == 'session':
+            return cached_answer(user, intent, self.get_session_info)
         
         # Help
-        elif any(word in message for word in ['help', 'assist', 'support']):
+        elif intent == 'help':
             return self.get_help_response(user)
         
         # Greeting
-        elif any(word in message for word in ['hello', 'hi', 'hey']):
+        elif intent == 'greeting':
             return {"message": f"👋 Hello {user.first_name}! As an administrator, you have full system access. How can I assist you?", "type": "greeting"}
         
         # Fallback to AI
@@ -94,37 +97,38 @@ class EnhancedChatService:
     
     def handle_staff_queries(self, user, message):
         """Handle staff-specific queries"""
+        intent = STAFF_INTENTS.route(message)
         
         # Profile information
-        if any(word in message for word in ['profile', 'my info', 'my details', 'who am i']):
+        if intent == 'profile':
             return self.get_enhanced_profile_info(user)
         
         # Attendance management
-        elif any(word in message for word in ['attendance', 'my attendance']):
-            return self.get_staff_attendance_info(user)
+        elif intent == 'attendance':
+            return cached_answer(user, intent, self.get_staff_attendance_info)
         
         # Subjects taught
-        elif any(word in message for word in ['subjects', 'courses', 'what i teach', 'academic']):
-            return self.get_enhanced_academic_info(user)
+        elif intent == 'academic':
+            return cached_answer(user, intent, self.get_enhanced_academic_info)
         
         # Session info - FIXED
-        elif any(word in message for word in ['session', 'academic year', 'year']):
-            return self.get_session_info(user)
+        elif intent == 'session':
+            return cached_answer(user, intent, self.get_session_info)
         
         # Notifications
-        elif any(word in message for word in ['notification', 'alert', 'message']):
+        elif intent == 'notifications':
             return self.get_enhanced_notifications(user)
         
         # Leave status
-        elif any(word in message for word in ['leave', 'time off']):
+        elif intent == 'leave':
             return self.get_staff_leave_status(user)
         
         # Help - FIXED
-        elif any(word in message for word in ['help', 'assist', 'support']):
+        elif intent == 'help':
             return self.get_help_response(user)
         
         # Greeting
-        elif any(word in message for word in ['hello', 'hi', 'hey']):
+        elif intent == 'greeting':
             return {"message": f"👋 Hello {user.first_name}! How can I help you with your teaching responsibilities?", "type": "greeting"}
         
         # Fallback to AI
@@ -133,41 +137,42 @@ class EnhancedChatService:
     
     def handle_student_queries(self, user, message):
         """Handle student-specific queries with improved patterns"""
+        intent = STUDENT_INTENTS.route(message)
         
         # Profile information
-        if any(word in message for word in ['profile', 'my info', 'my details', 'who am i']):
+        if intent == 'profile':
             return self.get_enhanced_profile_info(user)
         
         # Attendance
-        elif any(word in message for word in ['attendance', 'my attendance']):
-            return self.get_enhanced_attendance_info(user)
+        elif intent == 'attendance':
+            return cached_answer(user, intent, self.get_enhanced_attendance_info)
         
         # Results/Grades
-        elif any(word in message for word in ['result', 'grade', 'marks', 'score', 'performance']):
-            return self.get_student_results(user)
+        elif intent == 'results':
+            return cached_answer(user, intent, self.get_student_results)
         
         # Subjects/Academic info - IMPROVED
-        elif any(word in message for word in ['subjects', 'courses', 'my subjects', 'academic', 'subject']):
-            return self.get_enhanced_academic_info(user)
+        elif intent == 'academic':
+            return cached_answer(user, intent, self.get_enhanced_academic_info)
         
         # Session/Academic year - IMPROVED & FIXED
-        elif any(word in message for word in ['session', 'academic year', 'year', 'semester', 'term']):
-            return self.get_session_info(user)
+        elif intent == 'session':
+            return cached_answer(user, intent, self.get_session_info)
         
         # Notifications
-        elif any(word in message for word in ['notification', 'alert', 'message']):
+        elif intent == 'notifications':
             return self.get_enhanced_notifications(user)
         
         # Leave status
-        elif any(word in message for word in ['leave', 'time off', 'vacation']):
+        elif intent == 'leave':
             return self.get_student_leave_status(user)
         
         # Help - FIXED
-        elif any(word in message for word in ['help', 'assist', 'support', 'what can you do']):
+        elif intent == 'help':
             return self.get_help_response(user)
         
         # Greeting
-        elif any(word in message for word in ['hello', 'hi', 'hey']):
+        elif intent == 'greeting':
             return {"message": f"👋 Hello {user.first_name}! How can I help you with your academic information?", "type": "greeting"}
         
         # Fallback to AI
@@ -290,17 +295,17 @@ class EnhancedChatService:
                     return {"message": "❌ Staff profile not found.", "type": "error"}
                     
             else:  # Admin
-                # Admin can see all sessions
-                recent_sessions = Session.objects.order_by('-start_year')[:5]
+                # Admin can see all sessions, counted in the same query
+                recent_sessions = list(
+                    Session.objects.annotate(student_count=Count('student')).order_by('-start_year')[:5]
+                )
                 
-                if recent_sessions.exists():
-                    session_list = []
-                    for session in recent_sessions:
-                        student_count = Student.objects.filter(session=session).count()
-                        session_list.append(
-                            f"• **{session.start_year.year}-{session.end_year.year}** "
-                            f"({student_count} students)"
-                        )
+                if recent_sessions:
+                    session_list = [
+                        f"• **{session.start_year.year}-{session.end_year.year}** "
+                        f"({session.student_count} students)"
+                        for session in recent_sessions
+                    ]
                     
                     return {
                         "message": (
@@ -323,9 +328,8 @@ class EnhancedChatService:
             
             if user_type == '3':  # Student
                 student = Student.objects.get(admin=user)
-                attendance_reports = AttendanceReport.objects.filter(student=student)
-                total_classes = attendance_reports.count()
-                present_classes = attendance_reports.filter(status=True).count()
+                present_classes, absent_classes = student_attendance_totals(student)
+                total_classes = present_classes + absent_classes
                 
                 if total_classes == 0:
                     return {"message": "📊 **Attendance Summary**\n\nNo attendance records found yet.", "type": "info"}
@@ -337,7 +341,7 @@ class EnhancedChatService:
                         f"📊 **Your Attendance Summary**\n\n"
                         f"**Total Classes:** {total_classes}\n"
                         f"**Present:** {present_classes}\n"
-                        f"**Absent:** {total_classes - present_classes}\n"
+                        f"**Absent:** {absent_classes}\n"
                         f"**Attendance Rate:** {attendance_percentage:.1f}%"
                     ),
                     "type": "attendance"
@@ -371,19 +375,17 @@ class EnhancedChatService:
                     notifications.append(f"• {n.message}")
             
             elif user_type == '1':  # Admin
-                recent_students = Student.objects.order_by('-created_at')[:3]
-                recent_staff = Staff.objects.order_by('-created_at')[:3]
+                recent_students = self.get_recent_names('student')
+                recent_staff = self.get_recent_names('staff')
                 
                 notifications.append("📊 **Recent System Activity:**")
-                if recent_students.exists():
+                if recent_students:
                     notifications.append("**New Students:**")
-                    for student in recent_students:
-                        notifications.append(f"• {student.admin.get_full_name()}")
+                    notifications.extend(f"• {name}" for name in recent_students)
                 
-                if recent_staff.exists():
+                if recent_staff:
                     notifications.append("**New Staff:**")
-                    for staff in recent_staff:
-                        notifications.append(f"• {staff.admin.get_full_name()}")
+                    notifications.extend(f"• {name}" for name in recent_staff)
             
             if notifications:
                 return {"message": "🔔 **Recent Notifications:**\n\n" + "\n".join(notifications), "type": "notifications"}
@@ -443,14 +445,13 @@ class EnhancedChatService:
                 }
                 
             else:  # Admin
-                courses = Course.objects.all()
-                subjects = Subject.objects.all()
+                totals = self.get_course_totals()
                 
                 return {
                     "message": (
                         f"📚 **System Academic Overview:**\n\n"
-                        f"**Total Courses:** {courses.count()}\n"
-                        f"**Total Subjects:** {subjects.count()}\n\n"
+                        f"**Total Courses:** {totals['courses']}\n"
+                        f"**Total Subjects:** {totals['subjects']}\n\n"
                         f"💡 Visit the admin dashboard for detailed management."
                     ),
                     "type": "academic"
@@ -566,35 +567,47 @@ class EnhancedChatService:
             logger.error(f"Error getting staff attendance info for {user.email}: {str(e)}")
             return {"message": "❌ Error retrieving attendance information.", "type": "error"}
 
+    def get_user_totals(self):
+        """Student and staff counts in one query (each user has at most one profile)"""
+        return CustomUser.objects.aggregate(students=Count('student'), staff=Count('staff'))
+
+    def get_course_totals(self):
+        """Course and subject counts in one query"""
+        return Course.objects.aggregate(courses=Count('id', distinct=True), subjects=Count('subject'))
+
+    def get_recent_names(self, profile, limit=3):
+        """Full names of the newest users with a 'student' or 'staff' profile"""
+        return [
+            f"{first_name} {last_name}".strip()
+            for first_name, last_name in CustomUser.objects.filter(**{f'{profile}__isnull': False})
+            .order_by('-created_at').values_list('first_name', 'last_name')[:limit]
+        ]
+
     def get_system_overview(self):
-        """Get system overview for admin"""
+        """Get system overview for admin (four queries, whatever the data size)"""
         try:
-            total_students = Student.objects.count()
-            total_staff = Staff.objects.count()
-            total_courses = Course.objects.count()
-            total_subjects = Subject.objects.count()
+            user_totals = self.get_user_totals()
+            course_totals = self.get_course_totals()
             
             # Recent activity
-            recent_students = Student.objects.select_related('admin').order_by('-created_at')[:3]
-            recent_staff = Staff.objects.select_related('admin').order_by('-created_at')[:3]
+            recent_students = self.get_recent_names('student')
+            recent_staff = self.get_recent_names('staff')
             
             overview = (
                 f"📊 **System Overview**\n\n"
-                f"**Total Students:** {total_students}\n"
-                f"**Total Staff:** {total_staff}\n"
-                f"**Total Courses:** {total_courses}\n"
-                f"**Total Subjects:** {total_subjects}\n"
+                f"**Total Students:** {user_totals['students']}\n"
+                f"**Total Staff:** {user_totals['staff']}\n"
+                f"**Total Courses:** {course_totals['courses']}\n"
+                f"**Total Subjects:** {course_totals['subjects']}\n"
             )
             
-            if recent_students.exists():
+            if recent_students:
                 overview += "\n**📈 Recent Students:**\n"
-                for student in recent_students:
-                    overview += f"• {student.admin.get_full_name()}\n"
+                overview += "".join(f"• {name}\n" for name in recent_students)
             
-            if recent_staff.exists():
+            if recent_staff:
                 overview += "\n**📈 Recent Staff:**\n"
-                for staff in recent_staff:
-                    overview += f"• {staff.admin.get_full_name()}\n"
+                overview += "".join(f"• {name}\n" for name in recent_staff)
             
             return {"message": overview, "type": "overview"}
             
@@ -668,26 +681,13 @@ class EnhancedChatService:
         return status_map.get(status, "⏳ Unknown")
 
     def get_ai_response(self, user, message):
-        """Get AI response from Gemini"""
-        if self.system_settings and self.system_settings.gemini_api_key and HAS_GEMINI:
-            try:
-                genai.configure(api_key=self.system_settings.gemini_api_key)
-                model = genai.GenerativeModel('gemini-pro')
-                
-                context = (
-                    f"You are a helpful assistant for a College Management System. "
-                    f"The user is {user.first_name} {user.last_name} ({user.get_user_type_display()}). "
-                    f"Be concise and helpful. If asked about specific college data, "
-                    f"politely direct them to use the appropriate system features. "
-                    f"Answer the following question: {message}"
-                )
-                
-                response = model.generate_content(context)
-                return {"message": response.text, "type": "ai"}
-                
-            except Exception as e:
-                logger.error(f"Gemini AI error: {str(e)}")
-                pass
+        """Get AI response from Gemini, within the gateway's deadline"""
+        if self.system_settings and self.system_settings.gemini_api_key:
+            answer = get_gateway().ask(
+                ROLE_NAMES.get(str(user.user_type), 'User'), message, self.system_settings.gemini_api_key
+            )
+            if answer:
+                return {"message": answer, "type": "ai"}
         
         # Default response
         default_response = (
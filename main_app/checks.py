@@ -0,0 +1,37 @@
+# main_app/checks.py
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends whose entries are private to one process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """The importer and notification worker invalidate caches the web workers read."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', PROCESS_LOCAL_CACHES[0])
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f"The default cache ({backend}) is not shared between processes.",
+        hint="Dashboard stats and chat answers invalidated by process_imports or another "
+             "worker stay stale in the web processes until they expire. Use Redis or the "
+             "database cache (python manage.py createcachetable).",
+        id='main_app.W001',
+    )]
+
+
+@register(deploy=True)
+def production_cache_check(app_configs, **kwargs):
+    """The database cache works everywhere but costs a query per cache read."""
+    if settings.CACHES.get('default', {}).get('BACKEND') != 'django.core.cache.backends.db.DatabaseCache':
+        return []
+    return [Warning(
+        "The default cache is the database cache.",
+        hint="Every chat answer, dashboard and notification poll served from the cache "
+             "still queries the database. Set REDIS_URL in production.",
+        id='main_app.W002',
+    )]
@@ -1,7 +1,7 @@
 from .models import SystemSettings
 
 def system_settings(request):
-    setting = SystemSettings.objects.first()
+    setting = SystemSettings.get_cached()
     if not setting:
         return {'system_settings': None}
     return {'system_settings': setting}
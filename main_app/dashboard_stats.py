@@ -0,0 +1,134 @@
+# main_app/dashboard_stats.py
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_save
+
+DASHBOARD_STATS_CACHE_KEY = 'main_app:dashboard_stats'
+DASHBOARD_STATS_TIMEOUT = 300  # seconds; signals invalidate sooner on writes
+
+# Models whose writes change any of the numbers on the HOD dashboard
+_TRACKED_MODELS = (
+    'Staff', 'Student', 'Course', 'Subject',
+    'Attendance', 'AttendanceReport', 'LeaveReportStudent',
+)
+
+
+class DashboardStats:
+    """Snapshot of every aggregate rendered on the HOD dashboard.
+
+    Built from a fixed number of grouped queries, so the cost does not grow
+    with the number of students, subjects or courses.
+    """
+
+    def __init__(self, **values):
+        self.total_staff = values.get('total_staff', 0)
+        self.total_students = values.get('total_students', 0)
+        self.total_course = values.get('total_course', 0)
+        self.total_subject = values.get('total_subject', 0)
+        self.subject_list = values.get('subject_list', [])
+        self.attendance_list = values.get('attendance_list', [])
+        self.course_name_list = values.get('course_name_list', [])
+        self.subject_count_list = values.get('subject_count_list', [])
+        self.student_count_list_in_course = values.get('student_count_list_in_course', [])
+        self.student_count_list_in_subject = values.get('student_count_list_in_subject', [])
+        self.student_name_list = values.get('student_name_list', [])
+        self.student_attendance_present_list = values.get('student_attendance_present_list', [])
+        self.student_attendance_leave_list = values.get('student_attendance_leave_list', [])
+
+    @classmethod
+    def build(cls):
+        """Compute a fresh snapshot (six queries, regardless of data size)."""
+        from .models import (Course, LeaveReportStudent, Staff, Student,
+                             StudentSubjectAttendance, Subject)
+
+        courses = list(
+            Course.objects.annotate(
+                subject_count=Count('subject', distinct=True),
+                student_count=Count('student', distinct=True),
+            ).order_by('id').values('id', 'name', 'subject_count', 'student_count')
+        )
+        students_per_course = {c['id']: c['student_count'] for c in courses}
+
+        subjects = list(
+            Subject.objects.annotate(attendance_count=Count('attendance'))
+            .order_by('id').values('name', 'course_id', 'attendance_count')
+        )
+
+        attendance_by_student = {
+            row['student_id']: row
+            for row in StudentSubjectAttendance.objects.values('student_id').annotate(
+                present=Sum('present'),
+                absent=Sum('absent'),
+            ).order_by()
+        }
+        leave_by_student = dict(
+            LeaveReportStudent.objects.filter(status=1)
+            .values('student_id').annotate(total=Count('id'))
+            .order_by().values_list('student_id', 'total')
+        )
+        students = list(
+            Student.objects.order_by('id').values_list('id', 'admin__first_name')
+        )
+
+        present_list = []
+        leave_list = []
+        for student_id, _ in students:
+            counts = attendance_by_student.get(student_id, {})
+            present_list.append(counts.get('present', 0))
+            leave_list.append(counts.get('absent', 0) + leave_by_student.get(student_id, 0))
+
+        return cls(
+            total_staff=Staff.objects.count(),
+            total_students=len(students),
+            total_course=len(courses),
+            total_subject=len(subjects),
+            subject_list=[s['name'] for s in subjects],
+            attendance_list=[s['attendance_count'] for s in subjects],
+            course_name_list=[c['name'] for c in courses],
+            subject_count_list=[c['subject_count'] for c in courses],
+            student_count_list_in_course=[c['student_count'] for c in courses],
+            student_count_list_in_subject=[students_per_course.get(s['course_id'], 0) for s in subjects],
+            student_name_list=[name for _, name in students],
+            student_attendance_present_list=present_list,
+            student_attendance_leave_list=leave_list,
+        )
+
+    def as_context(self):
+        return dict(self.__dict__)
+
+
+def get_dashboard_stats():
+    """Return the cached snapshot, rebuilding it if it was invalidated."""
+    stats = cache.get(DASHBOARD_STATS_CACHE_KEY)
+    if stats is None:
+        stats = DashboardStats.build()
+        cache.set(DASHBOARD_STATS_CACHE_KEY, stats, DASHBOARD_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats(**kwargs):
+    """Drop the cached snapshot; also used as a signal receiver."""
+    cache.delete(DASHBOARD_STATS_CACHE_KEY)
+
+
+# Fields of CustomUser the snapshot shows (student_name_list)
+_TRACKED_USER_FIELDS = {'first_name'}
+
+
+def _user_changed(sender, update_fields=None, **kwargs):
+    # Logins and FCM token saves pass update_fields and leave names alone
+    if update_fields is None or _TRACKED_USER_FIELDS & set(update_fields):
+        invalidate_dashboard_stats()
+
+
+for _label, _signal in (('save', post_save), ('delete', post_delete)):
+    _signal.connect(_user_changed, sender='main_app.CustomUser',
+                    dispatch_uid=f'dashboard_stats_{_label}_CustomUser')
+
+for _model_name in _TRACKED_MODELS:
+    for _label, _signal in (('save', post_save), ('delete', post_delete)):
+        _signal.connect(
+            invalidate_dashboard_stats,
+            sender=f'main_app.{_model_name}',
+            dispatch_uid=f'dashboard_stats_{_label}_{_model_name}',
+        )
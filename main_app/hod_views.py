@@ -1,11 +1,12 @@
 import csv
-import io
 import json
-import requests
+from itertools import chain, islice
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.core.files.storage import FileSystemStorage
-from django.http import HttpResponse, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import (HttpResponse, HttpResponseRedirect,
                               get_object_or_404, redirect, render)
 from django.templatetags.static import static
@@ -14,7 +15,12 @@ from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import UpdateView
 
+from .dashboard_stats import get_dashboard_stats
 from .notification_service import NotificationService
+from .push_dispatcher import queue_push
+from .broadcast import ROLES as BROADCAST_ROLES, get_progress, queue_broadcast
+from .user_import import ADMIN_ROLE, STAFF_ROLE, STUDENT_ROLE, CSVHeaderError, read_rows
+from .import_jobs import error_report_rows, job_progress
 
 from django.utils import timezone
 from datetime import datetime
@@ -31,9 +37,6 @@ from .forms import *
 from .models import *
 
 
-ADMIN_ROLE = '1'
-STAFF_ROLE = '2'
-STUDENT_ROLE = '3'
 ROLE_LABELS = {
     ADMIN_ROLE: 'HOD / Admin',
     STAFF_ROLE: 'Staff',
@@ -41,18 +44,11 @@ ROLE_LABELS = {
 }
 INSTITUTION_NAME = getattr(settings, 'ID_CARD_INSTITUTION_NAME', 'College Management System')
 DEFAULT_PROFILE_PIC = static('dist/img/default-150x150.png')
-CSV_REQUIRED_FIELDS = {'first_name', 'last_name', 'email', 'gender', 'address'}
-CSV_HEADER_ALIASES = {
-    'first_name': {'first_name', 'firstname', 'first name'},
-    'last_name': {'last_name', 'lastname', 'last name'},
-    'email': {'email', 'email address', 'email_address'},
-    'gender': {'gender', 'sex'},
-    'address': {'address', 'home_address', 'home address'},
-    'course': {'course', 'course_name', 'course name', 'courseid', 'course id'},
-    'session': {'session', 'session_year', 'session year', 'sessionid', 'session id'},
-    'password': {'password', 'pass', 'temp_password'},
-    'profile_pic': {'profile_pic', 'profile picture', 'avatar', 'photo', 'profilepic'},
-}
+EXPORT_CHUNK_SIZE = 2000  # users fetched per round trip while streaming an export
+CSV_EXPORT_HEADER = [
+    'Role', 'First Name', 'Last Name', 'Email', 'Gender', 'Address',
+    'Phone', 'Course', 'Session', 'Registration Number', 'Staff ID', 'Extra Info', 'ID Code'
+]
 
 
 def _profile_photo_url(user):
@@ -135,127 +131,12 @@ def _filter_users_for_role(role_code, course_id=None, session_id=None):
     return base_queryset
 
 
-def _resolve_course(course_value):
-    if not course_value:
-        return None
-    course_value = course_value.strip()
-    if course_value.isdigit():
-        return Course.objects.filter(id=int(course_value)).first()
-    return Course.objects.filter(name__iexact=course_value).first()
-
-
-def _resolve_session(session_value):
-    if not session_value:
-        return None
-    value = session_value.strip()
-    if not value:
-        return None
-    if value.isdigit():
-        return Session.objects.filter(id=int(value)).first()
-    parts = [part.strip() for part in value.replace('/', '-').split('-') if part.strip()]
-    session_qs = Session.objects.all()
-    if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
-        session_qs = session_qs.filter(
-            start_year__year=int(parts[0]),
-            end_year__year=int(parts[1])
-        )
-    elif len(parts) == 1 and parts[0].isdigit():
-        session_qs = session_qs.filter(start_year__year=int(parts[0]))
-    else:
-        session_qs = session_qs.none()
-    return session_qs.first()
-
-
-def _normalize_gender(value):
-    if not value:
-        return None
-    normalized = value.strip().upper()
-    if normalized.startswith('M'):
-        return 'M'
-    if normalized.startswith('F'):
-        return 'F'
-    return None
-
-
-def _canonicalize_header(name):
-    key = (name or '').strip().lower()
-    if not key:
-        return key
-    for canonical, aliases in CSV_HEADER_ALIASES.items():
-        if key == canonical or key in aliases:
-            return canonical
-    return key
-
-
 def admin_home(request):
-    total_staff = Staff.objects.all().count()
-    total_students = Student.objects.all().count()
-    subjects = Subject.objects.all()
-    total_subject = subjects.count()
-    total_course = Course.objects.all().count()
-    attendance_list = Attendance.objects.filter(subject__in=subjects)
-    total_attendance = attendance_list.count()
-    attendance_list = []
-    subject_list = []
-    for subject in subjects:
-        attendance_count = Attendance.objects.filter(subject=subject).count()
-        subject_list.append(subject.name[:7])
-        attendance_list.append(attendance_count)
-
-    # Total Subjects and students in Each Course
-    course_all = Course.objects.all()
-    course_name_list = []
-    subject_count_list = []
-    student_count_list_in_course = []
-
-    for course in course_all:
-        subjects = Subject.objects.filter(course_id=course.id).count()
-        students = Student.objects.filter(course_id=course.id).count()
-        course_name_list.append(course.name)
-        subject_count_list.append(subjects)
-        student_count_list_in_course.append(students)
-    
-    subject_all = Subject.objects.all()
-    subject_list = []
-    student_count_list_in_subject = []
-    for subject in subject_all:
-        course = Course.objects.get(id=subject.course.id)
-        student_count = Student.objects.filter(course_id=course.id).count()
-        subject_list.append(subject.name)
-        student_count_list_in_subject.append(student_count)
-
-
-    # For Students
-    student_attendance_present_list=[]
-    student_attendance_leave_list=[]
-    student_name_list=[]
-
-    students = Student.objects.all()
-    for student in students:
-        
-        attendance = AttendanceReport.objects.filter(student_id=student.id, status=True).count()
-        absent = AttendanceReport.objects.filter(student_id=student.id, status=False).count()
-        leave = LeaveReportStudent.objects.filter(student_id=student.id, status=1).count()
-        student_attendance_present_list.append(attendance)
-        student_attendance_leave_list.append(leave+absent)
-        student_name_list.append(student.admin.first_name)
-
-    context = {
-        'page_title': "Administrative Dashboard",
-        'total_students': total_students,
-        'total_staff': total_staff,
-        'total_course': total_course,
-        'total_subject': total_subject,
-        'subject_list': subject_list,
-        'attendance_list': attendance_list,
-        'student_attendance_present_list': student_attendance_present_list,
-        'student_attendance_leave_list': student_attendance_leave_list,
-        "student_name_list": student_name_list,
-        "student_count_list_in_subject": student_count_list_in_subject,
-        "student_count_list_in_course": student_count_list_in_course,
-        "course_name_list": course_name_list,
-
-    }
+    # Aggregates come from a cached snapshot built by a fixed set of grouped
+    # queries (see dashboard_stats.py), so the page cost no longer grows with
+    # the number of students.
+    context = get_dashboard_stats().as_context()
+    context['page_title'] = "Administrative Dashboard"
     return render(request, 'hod_template/home_content.html', context)
 
 
@@ -387,8 +268,15 @@ def generate_qr_code(data_dict):
 
 
 def data_tools(request):
+    # The job just queued (?job=) or this HOD's latest one, for the progress panel
+    import_jobs = ImportJob.objects.filter(created_by=request.user).defer('source', 'errors')
+    job_id = request.GET.get('job', '')
+    if job_id.isdigit():
+        import_jobs = import_jobs.filter(id=job_id)
+    import_job = import_jobs.order_by('-created_at').first()
     context = {
         'page_title': 'CSV Import / Export',
+        'import_job': import_job,
         'role_labels': ROLE_LABELS,
         'courses': Course.objects.all().order_by('name'),
         'sessions': Session.objects.all().order_by('-start_year'),
@@ -420,48 +308,85 @@ def export_users_csv(request):
 
     timestamp = timezone.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{ROLE_LABELS[role].lower().replace(' ', '_')}_export_{timestamp}.csv"
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if role == ADMIN_ROLE:
+        queryset = queryset.select_related('admin')
+    users = queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return _csv_response(request, chain([CSV_EXPORT_HEADER], map(_export_row, users)), filename)
+
 
-    writer = csv.writer(response)
-    # Headers with new fields
-    writer.writerow([
-        'Role', 'First Name', 'Last Name', 'Email', 'Gender', 'Address',
-        'Phone', 'Course', 'Session', 'Registration Number', 'Staff ID', 'Extra Info', 'ID Code'
-    ])
-
-    for user in queryset:
-        payload = _build_id_card_payload(user)
-        phone = ''
-        reg_no = ''
-        staff_no = ''
-
-        if user.user_type == STUDENT_ROLE:
-            phone = getattr(user.student, 'phone', '')
-            reg_no = getattr(user.student, 'registration_number', '')
-        elif user.user_type == STAFF_ROLE:
-            phone = getattr(user.staff, 'phone', '')
-            staff_no = getattr(user.staff, 'staff_id_number', '')
-
-        writer.writerow([
-            payload['role'],
-            user.first_name,
-            user.last_name,
-            user.email,
-            payload['gender'],
-            payload['address'],
-            phone,
-            payload['course'] or '',
-            payload['session'] or '',
-            reg_no,
-            staff_no,
-            payload['extra_meta'] or '',
-            payload['id_code']
-        ])
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller."""
 
+    def write(self, value):
+        return value
+
+
+def _csv_response(request, rows, filename):
+    """Stream `rows` as a CSV attachment without holding the whole file.
+
+    Under ASGI, Django buffers a synchronous iterator in full before sending
+    it, so there the lines are fed through an async generator instead.
+    """
+    writer = csv.writer(_Echo())
+    lines = (writer.writerow(row) for row in rows)
+    if isinstance(request, ASGIRequest):
+        lines = _async_chunks(lines)
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 
+async def _async_chunks(lines, size=EXPORT_CHUNK_SIZE):
+    """Yield `lines` joined `size` at a time, read on the thread the view ran on."""
+    # thread_sensitive keeps the database cursor behind .iterator() on one connection
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, size)), thread_sensitive=True)
+    while chunk := await next_chunk():
+        yield chunk
+
+
+def _export_row(user):
+    """One CSV row from a user fetched with its profile (no queries, no QR code)."""
+    role_code = str(user.user_type)
+    phone = reg_no = staff_no = course = session = extra = ''
+
+    if role_code == STUDENT_ROLE:
+        profile = getattr(user, 'student', None)
+        if profile:
+            phone, reg_no = profile.phone, profile.registration_number
+            course = getattr(profile.course, 'name', '')
+            session = _session_label(profile.session) or ''
+            extra = f"Reg. No: {reg_no}"
+        id_code = f"CMP-S-{user.id:05d}"
+    elif role_code == STAFF_ROLE:
+        profile = getattr(user, 'staff', None)
+        if profile:
+            phone, staff_no = profile.phone, profile.staff_id_number
+            course = getattr(profile.course, 'name', '')
+            extra = f"Staff ID: {staff_no}"
+        id_code = f"CMP-T-{user.id:05d}"
+    else:
+        profile = getattr(user, 'admin', None)
+        if profile:
+            extra = f"Admin ID: {profile.admin_id_number}"
+        id_code = f"CMP-A-{user.id:05d}"
+
+    return [
+        user.get_user_type_display(),
+        user.first_name,
+        user.last_name,
+        user.email,
+        user.get_gender_display(),
+        user.address,
+        phone or '',
+        course or '',
+        session,
+        reg_no or '',
+        staff_no or '',
+        extra,
+        id_code,
+    ]
+
+
 def import_users_csv(request):
     if request.method != 'POST':
         messages.error(request, "Invalid request method for CSV import.")
@@ -483,111 +408,34 @@ def import_users_csv(request):
         messages.error(request, "Unable to decode file. Please upload UTF-8 encoded CSV.")
         return redirect(reverse('data_tools'))
 
-    reader = csv.DictReader(io.StringIO(decoded_file))
-    if reader.fieldnames:
-        reader.fieldnames = [_canonicalize_header(name) for name in reader.fieldnames]
-    header_set = set(reader.fieldnames or [])
-    if not header_set or not CSV_REQUIRED_FIELDS.issubset(header_set):
-        messages.error(
-            request,
-            "CSV header must include first_name,last_name,email,gender,address (plus course/session/password/profile_pic where needed)."
-        )
+    try:
+        next(read_rows(decoded_file), None)  # reject a bad header now rather than in the worker
+    except CSVHeaderError as exc:
+        messages.error(request, str(exc))
         return redirect(reverse('data_tools'))
 
-    created = 0
-    skipped = 0
-    errors = []
+    # Rows are imported by the process_imports worker; the page polls import_job_status
+    job = ImportJob.objects.create(
+        role=role,
+        filename=csv_file.name[:255],
+        source=decoded_file,
+        created_by=request.user,
+    )
+    messages.info(request, f"{csv_file.name} was queued for import. Progress is shown below.")
+    return redirect(f"{reverse('data_tools')}?job={job.id}")
 
-    for line_number, row in enumerate(reader, start=2):
-        if not row or not any(row.values()):
-            continue
 
-        try:
-            email = (row.get('email') or '').strip().lower()
-            first_name = (row.get('first_name') or '').strip()
-            last_name = (row.get('last_name') or '').strip()
-            gender = _normalize_gender(row.get('gender'))
-            address = (row.get('address') or '').strip()
-            phone = (row.get('phone') or '').strip()
-            course_value = (row.get('course') or '').strip()
-            session_value = (row.get('session') or '').strip()
-            password = (row.get('password') or '').strip()
-            profile_path = (row.get('profile_pic') or '').strip()
-            registration_number = (row.get('registration_number') or '').strip()
-            staff_id_number = (row.get('staff_id_number') or '').strip()
-
-            if not email or not first_name or not last_name or not gender or not address:
-                raise ValueError("Missing one of the required fields (first_name,last_name,email,gender,address).")
-
-            if CustomUser.objects.filter(email=email).exists():
-                skipped += 1
-                continue
-
-            course = None
-            session = None
-            if role in (STAFF_ROLE, STUDENT_ROLE):
-                course = _resolve_course(course_value)
-                if not course:
-                    raise ValueError("Course column is required for this role and must match an existing course.")
-            if role == STUDENT_ROLE:
-                session = _resolve_session(session_value)
-                if not session:
-                    raise ValueError(
-                        "Session column is required for students and must match an existing session (e.g. 2022-2023)."
-                    )
-                if not registration_number:
-                    raise ValueError("Registration number is required for students.")
-
-            if role == STAFF_ROLE and not staff_id_number:
-                raise ValueError("Staff ID number is required for staff.")
-
-            if not password:
-                password = CustomUser.objects.make_random_password()
-
-            user_kwargs = dict(
-                email=email,
-                password=password,
-                user_type=int(role),
-                first_name=first_name,
-                last_name=last_name,
-            )
-            if profile_path:
-                user_kwargs['profile_pic'] = profile_path
-            user = CustomUser.objects.create_user(**user_kwargs)
-            user.gender = gender
-            user.address = address
-            user.save()
-
-            if role == STAFF_ROLE:
-                user.staff.phone = phone
-                user.staff.staff_id_number = staff_id_number
-                if course:
-                    user.staff.course = course
-                user.staff.save()
-
-            elif role == STUDENT_ROLE:
-                user.student.phone = phone
-                user.student.registration_number = registration_number
-                if course:
-                    user.student.course = course
-                if session:
-                    user.student.session = session
-                user.student.save()
-
-            created += 1
-
-        except Exception as exc:
-            errors.append(f"Line {line_number}: {exc}")
-
-    if created:
-        messages.success(request, f"Successfully imported {created} record(s).")
-    if skipped:
-        messages.warning(request, f"Skipped {skipped} duplicate email(s).")
-    if errors:
-        preview_errors = errors[:5]
-        messages.error(request, "Some rows failed to import:\n" + "\n".join(preview_errors))
+def import_job_status(request, job_id):
+    job = get_object_or_404(ImportJob.objects.defer('source'), id=job_id, created_by=request.user)
+    progress = job_progress(job)
+    if progress['error_count']:
+        progress['report_url'] = reverse('import_job_errors', args=[job.id])
+    return JsonResponse({'success': True, **progress})
 
-    return redirect(reverse('data_tools'))
+
+def import_job_errors(request, job_id):
+    job = get_object_or_404(ImportJob, id=job_id, created_by=request.user)
+    return _csv_response(request, error_report_rows(job), f"import_{job.id}_errors.csv")
 
 
 
@@ -1245,6 +1093,8 @@ def admin_notify_users(request):
         'page_title': "Send Notifications",
         'allStaff': staff,
         'students': students,
+        'courses': Course.objects.all(),
+        'sessions': Session.objects.all(),
     }
     return render(request, "hod_template/notify_users.html", context)
 
@@ -1263,20 +1113,8 @@ def send_student_notification(request):
     message = request.POST.get('message')
     student = get_object_or_404(Student, admin_id=id)
     try:
-        url = "https://fcm.googleapis.com/fcm/send "
-        body = {
-            'notification': {
-                'title': "Student Management System",
-                'body': message,
-                'click_action': reverse('student_view_notification'),
-                'icon': static('dist/img/AdminLTELogo.png')
-            },
-            'to': student.admin.fcm_token
-        }
-        headers = {'Authorization':
-                   'key=AAAA3Bm8j_M:APA91bElZlOLetwV696SoEtgzpJr2qbxBfxVBfDWFiopBWzfCfzQp2nRyC7_A2mlukZEHV4g1AmyC6P_HonvSkY2YyliKt5tT3fe_1lrKod2Daigzhb2xnYQMxUWjCAIQcUexAMPZePB',
-                   'Content-Type': 'application/json'}
-        data = requests.post(url, data=json.dumps(body), headers=headers)
+        # Sent by the notification worker, not inside the request
+        queue_push(message, click_action=reverse('student_view_notification'), user_ids=[student.admin_id])
         notification = NotificationStudent(student=student, message=message)
         notification.save()
         # ===== DASHBOARD NOTIFICATION =====
@@ -1299,20 +1137,8 @@ def send_staff_notification(request):
     message = request.POST.get('message')
     staff = get_object_or_404(Staff, admin_id=id)
     try:
-        url = "https://fcm.googleapis.com/fcm/send"
-        body = {
-            'notification': {
-                'title': "Student Management System",
-                'body': message,
-                'click_action': reverse('staff_view_notification'),
-                'icon': static('dist/img/AdminLTELogo.png')
-            },
-            'to': staff.admin.fcm_token
-        }
-        headers = {'Authorization':
-                   'key=AAAA3Bm8j_M:APA91bElZlOLetwV696SoEtgzpJr2qbxBfxVBfDWFiopBWzfCfzQp2nRyC7_A2mlukZEHV4g1AmyC6P_HonvSkY2YyliKt5tT3fe_1lrKod2Daigzhb2xnYQMxUWjCAIQcUexAMPZePB',
-                   'Content-Type': 'application/json'}
-        data = requests.post(url, data=json.dumps(body), headers=headers)
+        # Sent by the notification worker, not inside the request
+        queue_push(message, click_action=reverse('staff_view_notification'), user_ids=[staff.admin_id])
         notification = NotificationStaff(staff=staff, message=message)
         notification.save()
                 # ----  DASHBOARD NOTIFICATION  ----
@@ -1329,6 +1155,47 @@ def send_staff_notification(request):
         return HttpResponse("False")
 
 
+def send_broadcast_notification(request):
+    """Queue one announcement for every student/staff matching the filter."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    message = request.POST.get('message', '').strip()
+    role = request.POST.get('role', 'all')
+    errors = []
+    if not message:
+        errors.append("Message cannot be empty")
+    if role not in BROADCAST_ROLES:
+        errors.append("Unknown audience")
+    filters = {}
+    for field, model in (('course', Course), ('session', Session)):
+        value = request.POST.get(field)
+        if not value:
+            filters[field + '_id'] = None
+        elif value.isdigit() and model.objects.filter(id=value).exists():
+            filters[field + '_id'] = int(value)
+        else:
+            errors.append(f"Unknown {field}")
+    if errors:
+        return JsonResponse({'success': False, 'error': errors[0], 'errors': errors})
+
+    broadcast_id, total = queue_broadcast(message, role, sender=request.user, **filters)
+    if not total:
+        return JsonResponse({'success': False, 'error': "No recipients match this filter"})
+    return JsonResponse({
+        'success': True,
+        'broadcast_id': broadcast_id,
+        'total': total,
+        'progress_url': reverse('broadcast_progress', args=[broadcast_id]),
+    })
+
+
+def broadcast_progress(request, broadcast_id):
+    progress = get_progress(broadcast_id)
+    if progress is None:
+        return JsonResponse({'success': False, 'error': 'Unknown broadcast'}, status=404)
+    return JsonResponse({'success': True, **progress})
+
+
 def delete_staff(request, staff_id):
     try:
         staff = Staff.objects.get(id=staff_id)
@@ -0,0 +1,138 @@
+# main_app/import_jobs.py
+"""Background CSV imports: queued by the data tools page, run by process_imports.
+
+A job is validated as a whole, then created chunk by chunk. Each chunk
+commits together with the job's progress counters, so the page polling
+import_job_status sees rows appear as they are written. If a worker dies
+mid-job, the job's updated_at heartbeat goes stale and another worker picks
+it up again. Rows that were already committed are then skipped as existing
+emails.
+"""
+import csv
+import io
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ImportJob
+from .user_import import (CSVHeaderError, ImportResult, create_rows, invalidate_caches,
+                          is_password_header, read_rows, validate_rows)
+
+logger = logging.getLogger(__name__)
+
+STALE_AFTER = timedelta(minutes=10)  # a running job not updated for this long is retried
+ERROR_PREVIEW = 5
+
+
+def claim_next_job(stale_after=STALE_AFTER):
+    """Mark the oldest pending (or abandoned) job as running and return it."""
+    stale = timezone.now() - stale_after
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[ImportJob.PENDING, ImportJob.RUNNING])
+            .exclude(status=ImportJob.RUNNING, updated_at__gte=stale)
+            .order_by('created_at').first()
+        )
+        if job is None:
+            return None
+        job.status = ImportJob.RUNNING
+        job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def run_job(job):
+    """Import the job's CSV; failures are recorded on the job, not raised."""
+    result = ImportResult()
+    try:
+        valid = validate_rows(job.role, read_rows(job.source), result)
+    except CSVHeaderError as exc:
+        return _finish(job, ImportJob.FAILED, str(exc))
+
+    job.total = len(valid) + result.skipped + len(result.errors)
+    job.to_create = len(valid)
+    job.skipped = result.skipped
+    job.errors = result.errors
+    job.created = 0
+    job.save(update_fields=['total', 'to_create', 'skipped', 'errors', 'created', 'updated_at'])
+
+    def progress(created):
+        job.created = created
+        job.save(update_fields=['created', 'updated_at'])
+
+    try:
+        create_rows(job.role, valid, on_chunk=progress)
+    except Exception as exc:  # noqa: BLE001 - reported to the HOD through the job
+        logger.exception("Import job %s failed", job.pk)
+        return _finish(job, ImportJob.FAILED, f"{type(exc).__name__}: {exc}")
+    finally:
+        if job.created:
+            invalidate_caches(job.role)
+    return _finish(job, ImportJob.DONE)
+
+
+def _finish(job, status, error=''):
+    job.status = status
+    job.last_error = error
+    job.finished_at = timezone.now()
+    # Afterwards only the error report reads the CSV, and never its passwords
+    job.source = _without_passwords(job.source) if job.errors else ''
+    job.save(update_fields=['status', 'last_error', 'finished_at', 'source', 'updated_at'])
+    return job
+
+
+def process_pending(stale_after=STALE_AFTER):
+    """Run queued jobs until none is left; returns how many were run."""
+    count = 0
+    while True:
+        job = claim_next_job(stale_after)
+        if job is None:
+            return count
+        run_job(job)
+        count += 1
+
+
+def job_progress(job):
+    """JSON-ready summary for the status endpoint."""
+    return {
+        'id': job.pk,
+        'filename': job.filename,
+        'status': job.get_status_display().lower(),
+        'finished': job.status in (ImportJob.DONE, ImportJob.FAILED),
+        'total': job.total,
+        'to_create': job.to_create,
+        'created': job.created,
+        'skipped': job.skipped,
+        'error_count': len(job.errors),
+        'errors': [f"Line {line}: {message}" for line, message in job.errors[:ERROR_PREVIEW]],
+        'last_error': job.last_error,
+    }
+
+
+def _without_passwords(source):
+    """The CSV text minus its password column; rows keep their line numbers."""
+    reader = csv.DictReader(io.StringIO(source))
+    fieldnames = [name for name in reader.fieldnames or [] if not is_password_header(name)]
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(reader)
+    return output.getvalue()
+
+
+def error_report_rows(job):
+    """Rows of the downloadable error report: line, error, then the row as uploaded.
+
+    The extra columns are ignored on import, so the fixed-up report can be
+    uploaded again as is. The password column is left out; rows imported
+    without one get a generated password.
+    """
+    failed = dict(job.errors)
+    reader = csv.DictReader(io.StringIO(job.source))
+    fieldnames = [name for name in reader.fieldnames or [] if not is_password_header(name)]
+    yield ['line', 'error'] + fieldnames
+    for line_number, row in enumerate(reader, start=2):  # numbered like user_import.read_rows
+        if line_number in failed:
+            yield [line_number, failed[line_number]] + [row.get(name) or '' for name in fieldnames]
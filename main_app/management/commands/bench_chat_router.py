@@ -0,0 +1,92 @@
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.chat_intents import (ADMIN_INTENTS, ADMIN_RULES, STAFF_INTENTS,
+                                   STAFF_RULES, STUDENT_INTENTS, STUDENT_RULES)
+
+ROLES = {
+    'admin': (ADMIN_INTENTS, ADMIN_RULES),
+    'staff': (STAFF_INTENTS, STAFF_RULES),
+    'student': (STUDENT_INTENTS, STUDENT_RULES),
+}
+
+# Routing the chat depends on; checked before timing. None = falls back to the AI.
+ROUTING_CASES = [
+    ('admin', 'show my profile', 'profile'),
+    ('admin', 'who am i', 'profile'),
+    ('admin', 'system overview please', 'overview'),
+    ('admin', 'how many students are there', 'student_count'),
+    ('admin', 'total staff', 'staff_count'),
+    ('admin', 'current academic year', 'session'),
+    ('admin', 'help', 'help'),
+    ('admin', 'hi', 'greeting'),
+    ('admin', 'is this thing on', None),
+    ('staff', 'check attendance', 'attendance'),
+    ('staff', 'what i teach', 'academic'),
+    ('staff', 'academic year', 'academic'),
+    ('staff', 'any notifications?', 'notifications'),
+    ('staff', 'my leave status', 'leave'),
+    ('staff', 'hey there', 'greeting'),
+    ('staff', 'which subjects do i have this year', 'academic'),
+    ('student', 'check attendance', 'attendance'),
+    ('student', 'my results', 'results'),
+    ('student', 'what are my marks in maths', 'results'),
+    ('student', 'my subjects', 'academic'),
+    ('student', 'session info', 'session'),
+    ('student', 'which semester is it', 'session'),
+    ('student', 'any notifications?', 'notifications'),
+    ('student', 'vacation', 'leave'),
+    ('student', 'what can you do', 'help'),
+    ('student', 'hello', 'greeting'),
+    ('student', 'this is the history of the internet', None),
+    ('student', 'show my profile and attendance', 'profile'),
+]
+
+
+def legacy_route(rules, message):
+    """The substring chains the router replaced, kept for comparison."""
+    return next((intent for intent, keywords in rules
+                 if any(word in message for word in keywords)), None)
+
+
+class Command(BaseCommand):
+    help = "Check chat intent routing against known cases and time it against substring matching"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000, help="Messages routed per timing run")
+
+    def handle(self, *args, **options):
+        wrong = [
+            (role, message, expected, ROLES[role][0].route(message))
+            for role, message, expected in ROUTING_CASES
+            if ROLES[role][0].route(message) != expected
+        ]
+        for role, message, expected, got in wrong:
+            self.stdout.write(self.style.ERROR(f"{role}: {message!r} -> {got}, expected {expected}"))
+        if wrong:
+            raise CommandError(f"{len(wrong)} routing cases failed")
+        self.stdout.write(self.style.SUCCESS(f"{len(ROUTING_CASES)} routing cases pass"))
+
+        for role, message, _ in ROUTING_CASES:
+            router, rules = ROLES[role]
+            if legacy_route(rules, message) != router.route(message):
+                self.stdout.write(f"  changed vs substring match: {role} {message!r}: "
+                                  f"{legacy_route(rules, message)} -> {router.route(message)}")
+
+        number = options['number']
+        cases = [(ROLES[role], message) for role, message, _ in ROUTING_CASES]
+        rounds = max(1, number // len(cases))
+
+        def run_router():
+            for (router, _), message in cases:
+                router.route(message)
+
+        def run_legacy():
+            for (_, rules), message in cases:
+                legacy_route(rules, message)
+
+        routed = rounds * len(cases)
+        for label, func in (('substring chain', run_legacy), ('compiled router', run_router)):
+            seconds = min(timeit.repeat(func, number=rounds, repeat=3))
+            self.stdout.write(f"{label:>16}: {seconds * 1e6 / routed:.2f} µs/message ({routed} messages)")
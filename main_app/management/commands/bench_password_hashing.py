@@ -0,0 +1,32 @@
+import time
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+
+from main_app.password_hashing import hash_passwords, hash_workers
+
+
+class Command(BaseCommand):
+    help = "Measure password hashing throughput of the bulk import path for growing worker counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--passwords', type=int, default=64, help="Passwords hashed per run")
+        parser.add_argument('--workers', type=int, nargs='*',
+                            help="Worker counts to try (default: 1, 2, 4, ... up to the available cores)")
+
+    def handle(self, *args, **options):
+        cores = hash_workers()
+        workers = options['workers'] or sorted({1, cores} | {2 ** i for i in range(1, 8) if 2 ** i < cores})
+        count = options['passwords']
+        hasher = get_hasher()
+        self.stdout.write(f"{hasher.algorithm}, {getattr(hasher, 'iterations', '-')} iterations, "
+                          f"{count} passwords, {cores} core(s) available")
+
+        baseline = None
+        for n in workers:
+            started = time.perf_counter()
+            for _ in hash_passwords(('password123' for _ in range(count)), workers=n):
+                pass
+            rate = count / (time.perf_counter() - started)
+            baseline = baseline or rate
+            self.stdout.write(f"{n:>3} worker(s): {rate:7.1f} passwords/s  ({rate / baseline:.2f}x)")
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from main_app.chat_views import EnhancedChatService
+from main_app.models import CustomUser
+
+# Admin intent -> (answer builder, queries allowed). The counts must not
+# depend on how many sessions, courses or users exist.
+ADMIN_QUERY_BUDGETS = {
+    'profile': (lambda service, user: service.get_enhanced_profile_info(user), 1),
+    'overview': (lambda service, user: service.get_system_overview(), 4),
+    'student_count': (lambda service, user: service.handle_admin_queries(user, 'students'), 1),
+    'staff_count': (lambda service, user: service.handle_admin_queries(user, 'staff'), 1),
+    'session': (lambda service, user: service.get_session_info(user), 1),
+    'academic': (lambda service, user: service.get_enhanced_academic_info(user), 1),
+    'notifications': (lambda service, user: service.get_enhanced_notifications(user), 2),
+}
+
+
+class Command(BaseCommand):
+    help = "Check that the admin chat answers stay within a fixed query budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-sql', action='store_true', help="Print the queries of intents over budget")
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.filter(user_type='1', is_active=True).first()
+        if user is None:
+            raise CommandError("Need an active HOD user to run the admin intents")
+
+        service = EnhancedChatService()
+        over = []
+        for intent, (build, budget) in ADMIN_QUERY_BUDGETS.items():
+            # Builders are called directly; process_message could be served from the answer cache
+            with CaptureQueriesContext(connection) as captured:
+                answer = build(service, user)
+            used = len(captured)
+            line = f"{intent:>14}: {used} queries (budget {budget})"
+            if answer.get('type') == 'error':
+                over.append(intent)
+                self.stdout.write(self.style.ERROR(f"{line} - returned an error: {answer['message']}"))
+            elif used > budget:
+                over.append(intent)
+                self.stdout.write(self.style.ERROR(line))
+                if options['verbose_sql']:
+                    for query in captured.captured_queries:
+                        self.stdout.write(f"    {query['sql']}")
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+
+        if over:
+            raise CommandError(f"Over budget or failing: {', '.join(over)}")
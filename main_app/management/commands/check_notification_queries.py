@@ -0,0 +1,68 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from main_app.models import CustomUser, DashboardNotification
+from main_app.notification_service import NotificationService
+
+TABLE = DashboardNotification._meta.db_table
+
+# Plan lines that mean the notification table is read in full / sorted in memory
+SEQ_SCAN = {
+    'sqlite': re.compile(rf'\bSCAN {TABLE}\b(?!.*\bINDEX\b)'),
+    'postgresql': re.compile(rf'Seq Scan on {TABLE}\b'),
+}
+SORT = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': re.compile(r'^\s*(->\s*)?Sort\b', re.MULTILINE),
+}
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot notification queries and fail if any falls back to a sequential scan"
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SEQ_SCAN:
+            raise CommandError(f"EXPLAIN checks are only implemented for SQLite and PostgreSQL, not {vendor}")
+
+        user = CustomUser.objects.filter(is_active=True).only('id').first()
+        if user is None:
+            raise CommandError("Need at least one active user to build the sample queries")
+        recipients = NotificationService.recipient_ids(user)
+
+        queries = {
+            'unread list': NotificationService.get_unread_notifications(user)[:10],
+            'unread count': DashboardNotification.objects.filter(
+                recipient_id__in=recipients, is_read=False).order_by(),
+            'mark all read': DashboardNotification.objects.filter(
+                recipient_id=user.id, is_read=False).order_by(),
+        }
+
+        failures = []
+        for name, queryset in queries.items():
+            plan = self.explain(queryset)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if SEQ_SCAN[vendor].search(plan):
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"  sequential scan on {TABLE}"))
+            elif SORT[vendor].search(plan):
+                self.stdout.write(self.style.WARNING("  uses an index but sorts in memory"))
+            else:
+                self.stdout.write(self.style.SUCCESS("  ok"))
+
+        if failures:
+            raise CommandError(f"Sequential scan in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All notification queries use an index"))
+
+    def explain(self, queryset):
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        # Small tables make PostgreSQL prefer a seq scan anyway; disabling it
+        # shows whether a usable index exists at all.
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
@@ -1,45 +1,139 @@
-from django.core.management.base import BaseCommand
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
-from main_app.models import Attendance, AttendanceReport, Student, Holiday
+
+from main_app.attendance_counters import record_new_reports
+from main_app.models import Attendance, AttendanceReport, Student, Subject, Holiday
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
 
 class Command(BaseCommand):
-    help = "Mark absence for students not present today (skip holidays)"
+    help = "Mark absence for students not present on a day (skip holidays)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Single day to process (YYYY-MM-DD, default: today)")
+        parser.add_argument('--from', dest='date_from', help="First day of a backfill range (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='date_to', help="Last day of a backfill range (YYYY-MM-DD, default: today)")
+        parser.add_argument('--dry-run', action='store_true', help="Print the counts without writing anything")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per INSERT")
 
     def handle(self, *args, **options):
-        today = timezone.now().date()
+        days = self.get_days(options)
+        dry_run = options['dry_run']
+        holidays = set(Holiday.objects.filter(
+            date__range=(days[0], days[-1])).values_list('date', flat=True))
+
+        # The absence row goes against the first subject of the student’s course (existing flow)
+        first_subject = {}
+        for course_id, subject_id in Subject.objects.order_by('course_id', 'id').values_list('course_id', 'id'):
+            first_subject.setdefault(course_id, subject_id)
+
+        for day in days:
+            # 1. Skip if the day is a holiday
+            if day in holidays:
+                self.stdout.write(self.style.SUCCESS(f"{day} is a holiday – no absence created."))
+                continue
+
+            created_attendance, created_reports, absent = self.mark_day(
+                day, first_subject, dry_run, options['batch_size'])
+            if dry_run:
+                self.stdout.write(
+                    f"[dry-run] {day}: {absent} students not present, would create "
+                    f"{created_attendance} attendance rows and {created_reports} absence reports")
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Marked {created_reports} students absent for {day} "
+                    f"({created_attendance} attendance rows created)"))
 
-        # 1. Skip if today is a holiday
-        if Holiday.objects.filter(date=today).exists():
-            self.stdout.write(self.style.SUCCESS(f"{today} is a holiday – no absence created."))
-            return
+    def get_days(self, options):
+        if options['date'] and (options['date_from'] or options['date_to']):
+            raise CommandError("Use either --date or --from/--to, not both")
+        today = timezone.now().date()
+        if options['date_from'] or options['date_to']:
+            start = _parse_date(options['date_from']) if options['date_from'] else today
+            end = _parse_date(options['date_to']) if options['date_to'] else today
+        else:
+            start = end = _parse_date(options['date']) if options['date'] else today
+        if start > end:
+            raise CommandError("--from must not be after --to")
+        return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
 
-        # 2. Students who were NOT marked PRESENT today
-        absent_students = Student.objects.exclude(
-            attendancereport__attendance__date=today,
-            attendancereport__status=True
+    def mark_day(self, day, first_subject, dry_run, batch_size):
+        """Return (attendance rows created, reports created, students not present)."""
+        # 2. Students who were NOT marked PRESENT that day (one anti-join)
+        present = AttendanceReport.objects.filter(
+            student=OuterRef('pk'), attendance__date=day, status=True)
+        absent_students = list(
+            Student.objects.filter(course_id__in=first_subject, session__isnull=False)
+            .filter(~Exists(present))
+            .values_list('id', 'course_id', 'session_id')
         )
+        if not absent_students:
+            return 0, 0, 0
+
+        wanted = {(first_subject[course_id], session_id) for _, course_id, session_id in absent_students}
+        subject_ids = {subject_id for subject_id, _ in wanted}
+        session_ids = {session_id for _, session_id in wanted}
+
+        # 3. Find / create one attendance row per (subject, session)
+        attendance_ids = self.existing_attendance(day, subject_ids, session_ids)
+        missing = wanted - set(attendance_ids)
+        if dry_run:
+            new_reports = self.count_new_reports(absent_students, first_subject, attendance_ids)
+            return len(missing), new_reports, len(absent_students)
+
+        with transaction.atomic():
+            if missing:
+                Attendance.objects.bulk_create(
+                    [Attendance(date=day, subject_id=subject_id, session_id=session_id)
+                     for subject_id, session_id in missing],
+                    batch_size=batch_size,
+                )
+                attendance_ids = self.existing_attendance(day, subject_ids, session_ids)
+
+            # 4. One “absent” report per student who has none on that row yet
+            already = self.existing_reports(attendance_ids)
+            reports = []
+            absent_by_subject = {}
+            for student_id, course_id, session_id in absent_students:
+                subject_id = first_subject[course_id]
+                attendance_id = attendance_ids[(subject_id, session_id)]
+                if (attendance_id, student_id) in already:
+                    continue
+                reports.append(AttendanceReport(student_id=student_id, attendance_id=attendance_id, status=False))
+                absent_by_subject.setdefault(subject_id, []).append(student_id)
+            AttendanceReport.objects.bulk_create(reports, batch_size=batch_size)
 
-        # 3. Create one “absent” record per absent student
-        count = 0
-        for student in absent_students:
-            # Pick any subject from the student’s course (existing flow)
-            subject = student.course.subject_set.first()
-            if not subject:
-                continue  # no subjects → skip
-
-            # Create / get attendance row for today (any subject)
-            attendance, _ = Attendance.objects.get_or_create(
-                date=today,
-                subject=subject,
-                session=student.session
-            )
-
-            # Mark absent
-            AttendanceReport.objects.get_or_create(
-                student=student,
-                attendance=attendance,
-                defaults={'status': False}
-            )
-            count += 1
-
-        self.stdout.write(self.style.SUCCESS(f"Marked {count} students absent for {today}"))
\ No newline at end of file
+            for subject_id, student_ids in absent_by_subject.items():
+                record_new_reports(subject_id, absent_ids=student_ids)
+
+        return len(missing), len(reports), len(absent_students)
+
+    def existing_attendance(self, day, subject_ids, session_ids):
+        rows = Attendance.objects.filter(
+            date=day, subject_id__in=subject_ids, session_id__in=session_ids
+        ).order_by('id').values_list('subject_id', 'session_id', 'id')
+        attendance_ids = {}
+        for subject_id, session_id, attendance_id in rows:
+            attendance_ids.setdefault((subject_id, session_id), attendance_id)
+        return attendance_ids
+
+    def existing_reports(self, attendance_ids):
+        return set(AttendanceReport.objects.filter(
+            attendance_id__in=attendance_ids.values()).values_list('attendance_id', 'student_id'))
+
+    def count_new_reports(self, absent_students, first_subject, attendance_ids):
+        already = self.existing_reports(attendance_ids)
+        return sum(
+            1 for student_id, course_id, session_id in absent_students
+            if (attendance_ids.get((first_subject[course_id], session_id)), student_id) not in already
+        )
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from main_app.models import CustomUser, Course, Session, Staff, Student, Subject, LeaveReportStudent, LeaveReportStaff, FeedbackStudent, FeedbackStaff
+from main_app.user_import import STAFF_ROLE, STUDENT_ROLE, create_rows
 from faker import Faker
 import random
 from datetime import date, timedelta
@@ -7,6 +9,10 @@ from datetime import date, timedelta
 class Command(BaseCommand):
     help = 'Populate database with demo data'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--staff', type=int, default=20, help="Staff users to create")
+        parser.add_argument('--students', type=int, default=20, help="Student users to create")
+
     def handle(self, *args, **kwargs):
         fake = Faker()
 
@@ -26,41 +32,14 @@ class Command(BaseCommand):
             sessions.append(session)
 
         self.stdout.write('Creating Staff...')
-        staff_users = []
-        for _ in range(20):
-            email = fake.email()
-            if not CustomUser.objects.filter(email=email).exists():
-                user = CustomUser.objects.create_user(
-                    email=email,
-                    password='password123',
-                    user_type=2,
-                    first_name=fake.first_name(),
-                    last_name=fake.last_name(),
-                    gender=random.choice(['M', 'F']),
-                    address=fake.address()
-                )
-                user.staff.course = random.choice(courses)
-                user.save()
-                staff_users.append(user)
+        staff_users = [
+            staff.admin for staff in self.create_users(fake, STAFF_ROLE, kwargs['staff'], courses)
+        ]
 
         self.stdout.write('Creating Students...')
-        student_users = []
-        for _ in range(20):
-            email = fake.email()
-            if not CustomUser.objects.filter(email=email).exists():
-                user = CustomUser.objects.create_user(
-                    email=email,
-                    password='password123',
-                    user_type=3,
-                    first_name=fake.first_name(),
-                    last_name=fake.last_name(),
-                    gender=random.choice(['M', 'F']),
-                    address=fake.address()
-                )
-                user.student.course = random.choice(courses)
-                user.student.session = random.choice(sessions)
-                user.save()
-                student_users.append(user)
+        student_users = [
+            student.admin for student in self.create_users(fake, STUDENT_ROLE, kwargs['students'], courses, sessions)
+        ]
 
         self.stdout.write('Creating Subjects...')
         for _ in range(20):
@@ -111,3 +90,25 @@ class Command(BaseCommand):
             )
 
         self.stdout.write(self.style.SUCCESS('Successfully populated demo data'))
+
+    def create_users(self, fake, role, count, courses, sessions=None):
+        """Bulk-create `count` demo users (passwords hashed on all cores); returns their profiles."""
+        emails = {fake.unique.email() for _ in range(count)}
+        emails -= set(CustomUser.objects.filter(email__in=emails).values_list('email', flat=True))
+        rows = [{
+            'email': email,
+            'first_name': fake.first_name(),
+            'last_name': fake.last_name(),
+            'gender': random.choice(['M', 'F']),
+            'address': fake.address(),
+            'phone': '',
+            'password': 'password123',
+            'profile_pic': '',
+            'id_number': '',
+            'course': random.choice(courses),
+            'session': random.choice(sessions) if sessions else None,
+        } for email in emails]
+        with transaction.atomic():
+            create_rows(role, rows)
+        model = Student if role == STUDENT_ROLE else Staff
+        return list(model.objects.filter(admin__email__in=emails).select_related('admin', 'course'))
@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from main_app.import_jobs import STALE_AFTER, process_pending
+
+
+class Command(BaseCommand):
+    help = "Run queued CSV import jobs from the data tools page"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling instead of exiting once the queue is empty")
+        parser.add_argument('--sleep', type=float, default=5,
+                            help="Seconds to wait between polls when idle (with --loop)")
+        parser.add_argument('--stale-after', type=int, default=int(STALE_AFTER.total_seconds()),
+                            help="Seconds without progress after which a running job is picked up again")
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options['stale_after'])
+        total = 0
+        while True:
+            count = process_pending(stale_after)
+            total += count
+            if count:
+                self.stdout.write(f"Ran {count} import job(s)")
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Import queue empty: {total} job(s) run"))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main_app.notification_outbox import MAX_ATTEMPTS, process_batch
+
+
+class Command(BaseCommand):
+    help = "Render queued notifications from the outbox, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Outbox rows per batch")
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help="Give up on a row after this many failures")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling instead of exiting once the outbox is drained")
+        parser.add_argument('--sleep', type=float, default=5,
+                            help="Seconds to wait between polls when idle (with --loop)")
+
+    def handle(self, *args, **options):
+        totals = [0, 0, 0]
+        while True:
+            done, retried, failed = process_batch(options['batch_size'], options['max_attempts'])
+            totals = [totals[0] + done, totals[1] + retried, totals[2] + failed]
+            if done or retried or failed:
+                self.stdout.write(f"Processed {done} notifications ({retried} to retry, {failed} failed)")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox drained: {totals[0]} processed, {totals[1]} scheduled for retry, {totals[2]} failed"))
@@ -0,0 +1,150 @@
+import gzip
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from main_app.models import DashboardNotification, DashboardNotificationArchive, NotificationOutbox
+from main_app.notification_service import NotificationService, notifications_changed
+
+DEFAULT_RETENTION_DAYS = 90
+OUTBOX_RETENTION_DAYS = 7  # processed outbox rows; failed ones are kept for inspection
+ESTIMATE_SAMPLE_SIZE = 500
+
+ARCHIVE_FIELDS = ('id', 'recipient_id', 'sender_id', 'notification_type', 'title',
+                  'message', 'related_id', 'created_at')
+DUPLICATE_KEY = ('notification_type', 'title', 'message', 'related_id')
+
+
+class Command(BaseCommand):
+    help = ("Archive read dashboard notifications older than --days, collapse "
+            "duplicate system notifications and delete processed outbox rows")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=DEFAULT_RETENTION_DAYS,
+                            help="Keep read notifications newer than this many days")
+        parser.add_argument('--outbox-days', type=int, default=OUTBOX_RETENTION_DAYS,
+                            help="Keep processed notification outbox rows newer than this many days")
+        parser.add_argument('--to-file', metavar='PATH',
+                            help="Append archived rows to a gzip JSONL file instead of the archive table")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per archive batch")
+        parser.add_argument('--no-collapse', action='store_true',
+                            help="Leave duplicate system notifications alone")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report what would be archived and the estimated sizes")
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['outbox_days'] < 0 or options['batch_size'] < 1:
+            raise CommandError("--days and --outbox-days must be >= 0 and --batch-size >= 1")
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['days'])
+        expired = DashboardNotification.objects.filter(is_read=True, created_at__lt=cutoff)
+        processed = NotificationOutbox.objects.filter(
+            status=NotificationOutbox.DONE, processed_at__lt=now - timedelta(days=options['outbox_days']))
+
+        if options['dry_run']:
+            self.report(expired, options)
+            self.stdout.write(f"[dry-run] {processed.count()} processed outbox rows older than "
+                              f"{options['outbox_days']} days would be deleted")
+            return
+
+        collapsed = 0 if options['no_collapse'] else self.collapse_duplicates()
+        archived = self.archive(expired, options['batch_size'], options['to_file'])
+        pruned = self.prune_outbox(processed, options['batch_size'])
+        target = options['to_file'] or DashboardNotificationArchive._meta.db_table
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} notifications older than {options['days']} days to {target}; "
+            f"removed {collapsed} duplicate system notifications and {pruned} processed outbox rows"))
+
+    # ---------- duplicates ----------
+    def duplicate_groups(self):
+        """(key, newest id, size) for system notifications sharing type/title/message/related_id."""
+        return (
+            DashboardNotification.objects
+            .filter(recipient_id=NotificationService.get_system_user_id())
+            .values(*DUPLICATE_KEY)
+            .annotate(keep_id=Max('id'), copies=Count('id'))
+            .filter(copies__gt=1)
+            .order_by()
+        )
+
+    def collapse_duplicates(self):
+        """Keep the newest copy of each duplicated system notification."""
+        removed = 0
+        system_id = NotificationService.get_system_user_id()
+        for group in self.duplicate_groups():
+            key = {field: group[field] for field in DUPLICATE_KEY}
+            deleted, _ = (
+                DashboardNotification.objects
+                .filter(recipient_id=system_id, id__lt=group['keep_id'], **key)
+                .delete()
+            )
+            removed += deleted
+        if removed:
+            # Bulk deletes skip the signals; archiving only removes read rows
+            notifications_changed(system_id)
+        return removed
+
+    # ---------- archive ----------
+    def archive(self, expired, batch_size, path):
+        archived = 0
+        while True:
+            rows = list(expired.order_by('id').values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                return archived
+            if path:
+                # Written before the delete, so a failure can only duplicate lines
+                with gzip.open(path, 'at', encoding='utf-8') as archive_file:
+                    for row in rows:
+                        archive_file.write(self.as_json(row) + '\n')
+            ids = [row['id'] for row in rows]
+            with transaction.atomic():
+                if not path:
+                    DashboardNotificationArchive.objects.bulk_create([
+                        DashboardNotificationArchive(
+                            original_id=row['id'], **{field: row[field] for field in ARCHIVE_FIELDS[1:]})
+                        for row in rows
+                    ])
+                DashboardNotification.objects.filter(id__in=ids).delete()
+            archived += len(rows)
+            self.stdout.write(f"  archived {archived} so far")
+
+    def prune_outbox(self, processed, batch_size):
+        pruned = 0
+        while True:
+            ids = list(processed.order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return pruned
+            pruned += NotificationOutbox.objects.filter(id__in=ids).delete()[0]
+
+    def as_json(self, row):
+        return json.dumps({**row, 'created_at': row['created_at'].isoformat()}, separators=(',', ':'))
+
+    # ---------- dry run ----------
+    def report(self, expired, options):
+        total = expired.count()
+        duplicates = 0 if options['no_collapse'] else sum(
+            group['copies'] - 1 for group in self.duplicate_groups())
+        self.stdout.write(f"[dry-run] {total} read notifications older than {options['days']} days "
+                          f"would be archived in {-(-total // options['batch_size'])} batches")
+        self.stdout.write(f"[dry-run] {duplicates} duplicate system notifications would be removed")
+        if not total:
+            return
+        sample = [self.as_json(row) for row in expired.order_by('id').values(*ARCHIVE_FIELDS)[:ESTIMATE_SAMPLE_SIZE]]
+        raw = sum(len(line.encode('utf-8')) + 1 for line in sample)
+        compressed = len(gzip.compress('\n'.join(sample).encode('utf-8')))
+        scale = total / len(sample)
+        self.stdout.write(f"[dry-run] estimated JSONL size {self.human(raw * scale)}, "
+                          f"gzip about {self.human(compressed * scale)} "
+                          f"(from a sample of {len(sample)} rows)")
+
+    @staticmethod
+    def human(size):
+        for unit in ('B', 'KB', 'MB'):
+            if size < 1024:
+                return f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.1f} GB"
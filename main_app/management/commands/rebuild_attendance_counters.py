@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from main_app.attendance_counters import rebuild_attendance_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-student, per-subject attendance counters from AttendanceReport"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Rows per INSERT when writing the counters")
+
+    def handle(self, *args, **options):
+        written = rebuild_attendance_counters(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} attendance counter rows"))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    AttendanceReport = apps.get_model('main_app', 'AttendanceReport')
+    StudentSubjectAttendance = apps.get_model('main_app', 'StudentSubjectAttendance')
+    grouped = (
+        AttendanceReport.objects
+        .values('student_id', 'attendance__subject_id')
+        .annotate(present=Count('id', filter=Q(status=True)),
+                  absent=Count('id', filter=Q(status=False)))
+        .order_by()
+    )
+    StudentSubjectAttendance.objects.bulk_create([
+        StudentSubjectAttendance(
+            student_id=row['student_id'],
+            subject_id=row['attendance__subject_id'],
+            present=row['present'],
+            absent=row['absent'],
+        )
+        for row in grouped
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSubjectAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_app.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_app.subject')),
+            ],
+            options={
+                'unique_together': {('student', 'subject')},
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.contrib.auth.hashers import make_password
+from django.db import migrations
+
+SYSTEM_USER_EMAIL = 'system@college.edu'
+
+
+def create_system_user(apps, schema_editor):
+    """Create the sentinel recipient for broadcast dashboard notifications.
+
+    It used to be created lazily on the first holiday notification; it can
+    never log in and must not show up as an active HOD.
+    """
+    CustomUser = apps.get_model('main_app', 'CustomUser')
+    user, created = CustomUser.objects.get_or_create(
+        email=SYSTEM_USER_EMAIL,
+        defaults={
+            'first_name': 'System',
+            'password': make_password(None),
+            'is_active': False,
+        },
+    )
+    if not created and user.is_active:
+        CustomUser.objects.filter(pk=user.pk).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0002_studentsubjectattendance'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_system_user, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_dashboardnotificationarchive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dashboardnotification',
+            index=models.Index(fields=['recipient', 'is_read', '-created_at'], name='dashnotif_recipient_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dashboardnotification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', '-created_at'], name='dashnotif_unread_idx'),
+        ),
+        # Dropped after the replacements exist; its columns prefix dashnotif_recipient_read_idx
+        migrations.RemoveIndex(
+            model_name='dashboardnotification',
+            name='main_app_da_recipie_3a0718_idx',
+        ),
+    ]
@@ -1,9 +1,14 @@
+import time
+
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractUser, UserManager
-from django.db import models
-from django.db.models.signals import post_save, pre_save
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.templatetags.static import static
+from django.utils import timezone
 
 
 
@@ -72,7 +77,42 @@ class CustomUser(AbstractUser):
         return static('dist/img/default-150x150.png')
 
 
-class Admin(models.Model):
+class ProfileChangesMixin:
+    """Remembers profile field values as loaded or last saved, so that
+    save_user_profile can write only the fields edited since."""
+
+    def _field_values(self):
+        # Only values already in __dict__: reading a deferred field would query
+        return {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+        }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_values = instance._field_values()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        values = self._field_values()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # The other fields were not written, so they still count as changed
+            written = {self._meta.get_field(name).attname for name in update_fields}
+            values = {**getattr(self, '_saved_values', {}),
+                      **{name: value for name, value in values.items() if name in written}}
+        self._saved_values = values
+
+    def changed_fields(self):
+        saved = getattr(self, '_saved_values', {})
+        return [name for name, value in self._field_values().items()
+                if name not in saved or saved[name] != value]
+
+
+class Admin(ProfileChangesMixin, models.Model):
     admin = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
     admin_id_number = models.CharField(max_length=20, unique=True, blank=True, null=True, help_text="Leave blank to auto-generate ADM-XXXX")
     phone = models.CharField(max_length=10, blank=True, null=True)
@@ -88,7 +128,7 @@ class Course(models.Model):
         return self.name
 
 
-class Student(models.Model):
+class Student(ProfileChangesMixin, models.Model):
     admin = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
     registration_number = models.CharField(max_length=20, unique=True, blank=True, null=True, help_text="Government-issued ID (Admin only)")
     phone = models.CharField(max_length=10, blank=True, null=True)
@@ -99,7 +139,7 @@ class Student(models.Model):
         return self.admin.last_name + ", " + self.admin.first_name
 
 
-class Staff(models.Model):
+class Staff(ProfileChangesMixin, models.Model):
     staff_id_number = models.CharField(max_length=20, unique=True, blank=True, null=True, help_text="Leave blank to auto-generate STF-XXXX")
     phone = models.CharField(max_length=10, blank=True, null=True)
     course = models.ForeignKey(Course, on_delete=models.DO_NOTHING, null=True, blank=False)
@@ -136,6 +176,26 @@ class AttendanceReport(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+class StudentSubjectAttendance(models.Model):
+    """Denormalized present/absent counters per (student, subject).
+
+    Kept in step with AttendanceReport by the attendance write paths in
+    attendance_counters.py; rebuild with `manage.py rebuild_attendance_counters`.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'subject')
+
+    @property
+    def total(self):
+        return self.present + self.absent
+
+
 class LeaveReportStudent(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     date = models.DateField()          # ← CharField → DateField
@@ -205,46 +265,123 @@ def create_user_profile(sender, instance, created, **kwargs):
             Student.objects.create(admin=instance)
 
 
+# user_type -> (profile accessor, ID field)
+PROFILE_ACCESSORS = {
+    '1': ('admin', 'admin_id_number'),
+    '2': ('staff', 'staff_id_number'),
+    '3': ('student', 'registration_number'),
+}
+
+
 @receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, **kwargs):
-    if instance.user_type == 1:
-        instance.admin.save()
-    if instance.user_type == 2:
-        instance.staff.save()
-    if instance.user_type == 3:
-        instance.student.save()
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Only a profile attached to this user object can have unsaved edits; a new
+    # one was just created above, and update_fields saves (last_login, fcm_token)
+    # never touch it.
+    if created or update_fields:
+        return
+    accessor, id_field = PROFILE_ACCESSORS.get(str(instance.user_type), (None, None))
+    if accessor is None or not getattr(CustomUser, accessor).is_cached(instance):
+        return
+    try:
+        profile = getattr(instance, accessor)
+    except ObjectDoesNotExist:
+        return
+    if profile.pk is None:
+        profile.save()
+        return
+    changed = profile.changed_fields()
+    if changed:
+        if not getattr(profile, id_field):
+            changed.append(id_field)  # allocated by the pre_save receiver below
+        profile.save(update_fields=changed)
 
 
 # ---------- auto-generate ID numbers ----------
-from django.contrib.auth import get_user_model
-
-def make_id(model, prefix, field='id'):
-    """Return next sequential ID with prefix."""
-    last = model.objects.filter(**{f"{field}__isnull": False}).order_by(field).last()
-    if last:
-        raw = getattr(last, field) or ''
-        try:
-            seq = int(raw.split('-')[1]) + 1
-        except Exception:
-            seq = 1
-    else:
-        seq = 1
-    return f"{prefix}-{seq:04d}"
+class IdSequence(models.Model):
+    """Last number handed out for one ID prefix (ADM, STF, REG)"""
+    prefix = models.CharField(max_length=10, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefix}: {self.value}"
+
+
+# prefix -> (profile model, ID field), used to seed a counter from existing rows
+ID_FIELDS = {
+    'ADM': (Admin, 'admin_id_number'),
+    'STF': (Staff, 'staff_id_number'),
+    'REG': (Student, 'registration_number'),
+}
+
+
+def format_id(prefix, number):
+    return f"{prefix}-{number:04d}"
+
+
+def _highest_issued(prefix):
+    """Largest number already used as PREFIX-<n>, compared numerically."""
+    model, field = ID_FIELDS[prefix]
+    highest = 0
+    for value in model.objects.filter(**{f'{field}__startswith': f'{prefix}-'}).values_list(field, flat=True).iterator():
+        suffix = value[len(prefix) + 1:]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def allocate_ids(prefix, count=1, reserved=()):
+    """Reserve `count` unused IDs for `prefix` and return them in increasing order.
+
+    The counter row is locked with select_for_update while it is advanced,
+    so concurrent creates never receive the same number. The lock, and the
+    advanced counter, only commit with the outermost transaction. Called in
+    autocommit mode (no ATOMIC_REQUESTS, or the importer's per-chunk
+    transactions), that is as soon as this returns, so a later failed insert
+    leaves a gap instead of giving its numbers back. The first call for a
+    prefix seeds the counter from the IDs already in the table. Numbers
+    someone has since typed in by hand are skipped, as are those in
+    `reserved` (IDs about to be inserted along with the allocated ones).
+    """
+    if count < 1:
+        return []
+    model, field = ID_FIELDS[prefix]
+    with transaction.atomic():
+        sequence = IdSequence.objects.select_for_update().filter(prefix=prefix).first()
+        if sequence is None:
+            try:
+                with transaction.atomic():
+                    sequence = IdSequence.objects.create(prefix=prefix, value=_highest_issued(prefix))
+            except IntegrityError:  # another transaction seeded it first
+                sequence = IdSequence.objects.select_for_update().get(prefix=prefix)
+        ids = []
+        while len(ids) < count:
+            batch = [format_id(prefix, n) for n in range(sequence.value + 1, sequence.value + 1 + count - len(ids))]
+            sequence.value += len(batch)
+            taken = set(model.objects.filter(**{f'{field}__in': batch}).values_list(field, flat=True))
+            ids.extend(value for value in batch if value not in taken and value not in reserved)
+        sequence.save(update_fields=['value'])
+    return ids
+
+
+def _needs_id(instance, field, update_fields):
+    # A save limited to other fields would drop the number and burn it
+    return not getattr(instance, field) and (update_fields is None or field in update_fields)
 
 @receiver(pre_save, sender=Admin)
-def set_admin_id(sender, instance, **kwargs):
-    if not instance.admin_id_number:
-        instance.admin_id_number = make_id(Admin, 'ADM', 'admin_id_number')
+def set_admin_id(sender, instance, update_fields=None, **kwargs):
+    if _needs_id(instance, 'admin_id_number', update_fields):
+        instance.admin_id_number = allocate_ids('ADM')[0]
 
 @receiver(pre_save, sender=Staff)
-def set_staff_id(sender, instance, **kwargs):
-    if not instance.staff_id_number:
-        instance.staff_id_number = make_id(Staff, 'STF', 'staff_id_number')
+def set_staff_id(sender, instance, update_fields=None, **kwargs):
+    if _needs_id(instance, 'staff_id_number', update_fields):
+        instance.staff_id_number = allocate_ids('STF')[0]
 
 @receiver(pre_save, sender=Student)
-def set_reg_num(sender, instance, **kwargs):
-    if not instance.registration_number:
-        instance.registration_number = make_id(Student, 'REG', 'registration_number')
+def set_reg_num(sender, instance, update_fields=None, **kwargs):
+    if _needs_id(instance, 'registration_number', update_fields):
+        instance.registration_number = allocate_ids('REG')[0]
 
 
 class SystemSettings(models.Model):
@@ -269,6 +406,38 @@ class SystemSettings(models.Model):
             pass
         return super(SystemSettings, self).save(*args, **kwargs)
 
+    @classmethod
+    def get_cached(cls):
+        """Return the active settings row (or None) without a query per call.
+
+        Looked up once per process every SYSTEM_SETTINGS_LOCAL_TTL seconds and
+        shared across processes through the cache framework; the signal
+        receivers below drop both copies whenever the row changes.
+        """
+        now = time.monotonic()
+        if _system_settings_memo and _system_settings_memo[0] > now:
+            return _system_settings_memo[1]
+        setting = cache.get(SYSTEM_SETTINGS_CACHE_KEY, _NOT_CACHED)
+        if setting is _NOT_CACHED:
+            setting = cls.objects.first()
+            cache.set(SYSTEM_SETTINGS_CACHE_KEY, setting, SYSTEM_SETTINGS_CACHE_TIMEOUT)
+        _system_settings_memo[:] = [now + SYSTEM_SETTINGS_LOCAL_TTL, setting]
+        return setting
+
+
+SYSTEM_SETTINGS_CACHE_KEY = 'main_app:system_settings'
+SYSTEM_SETTINGS_CACHE_TIMEOUT = 3600
+SYSTEM_SETTINGS_LOCAL_TTL = 30  # bounds staleness in processes that missed the signal
+_NOT_CACHED = object()
+_system_settings_memo = []  # [expires_at, settings]
+
+
+@receiver(post_save, sender=SystemSettings)
+@receiver(post_delete, sender=SystemSettings)
+def invalidate_system_settings(sender, **kwargs):
+    _system_settings_memo.clear()
+    cache.delete(SYSTEM_SETTINGS_CACHE_KEY)
+
 
 
 class DashboardNotification(models.Model):
@@ -297,7 +466,11 @@ class DashboardNotification(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['recipient', 'is_read']),
+            # Serves the unread list (filter + ORDER BY created_at DESC) and counts
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='dashnotif_recipient_read_idx'),
+            # Only unread rows, which stay few while read history grows
+            models.Index(fields=['recipient', '-created_at'], condition=models.Q(is_read=False),
+                         name='dashnotif_unread_idx'),
             models.Index(fields=['notification_type']),
         ]
     
@@ -316,6 +489,97 @@ class DashboardNotification(models.Model):
         return "System"
 
 
+class DashboardNotificationArchive(models.Model):
+    """Read notifications moved out of DashboardNotification by prune_notifications"""
+    original_id = models.BigIntegerField()
+    recipient_id = models.BigIntegerField(db_index=True)
+    sender_id = models.BigIntegerField(null=True, blank=True)
+    notification_type = models.CharField(max_length=20)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    related_id = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.notification_type} - {self.title}"
+
+
+class NotificationOutbox(models.Model):
+    """Pending notification work, drained by the process_notifications command"""
+    PENDING = 0
+    DONE = 1
+    FAILED = -1
+    STATUS = ((PENDING, 'Pending'), (DONE, 'Done'), (FAILED, 'Failed'))
+
+    event = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.SmallIntegerField(choices=STATUS, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event} ({self.get_status_display()})"
+
+
+class Broadcast(models.Model):
+    """Progress of an announcement queued from the notify users page, see main_app.broadcast"""
+    QUEUED = 0
+    RUNNING = 1
+    STATUS = ((QUEUED, 'Queued'), (RUNNING, 'Running'))
+
+    status = models.SmallIntegerField(choices=STATUS, default=QUEUED)
+    total = models.PositiveIntegerField(default=0)  # recipients; recounted when the worker starts
+    sent = models.PositiveIntegerField(default=0)   # raised in the same commit as each chunk's rows
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Broadcast {self.pk}: {self.sent}/{self.total}"
+
+
+class ImportJob(models.Model):
+    """A CSV upload from the data tools page, imported by the process_imports command"""
+    PENDING = 0
+    RUNNING = 1
+    DONE = 2
+    FAILED = -1
+    STATUS = ((PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed'))
+
+    role = models.CharField(max_length=1, choices=CustomUser.USER_TYPE)
+    filename = models.CharField(max_length=255, blank=True)
+    # Decoded CSV, in the database so any worker dyno can read it. Cleared when
+    # the job finishes, or kept without the password column for the error report.
+    source = models.TextField()
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='import_jobs')
+    status = models.SmallIntegerField(choices=STATUS, default=PENDING)
+    total = models.PositiveIntegerField(default=0)      # data rows in the file
+    to_create = models.PositiveIntegerField(default=0)  # rows that passed validation
+    created = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list)  # [line number, message] per rejected row
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # heartbeat while running
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename or 'import'} ({self.get_status_display()})"
+
+
 class Holiday(models.Model):
     name = models.CharField(max_length=120)
     date = models.DateField(unique=True)
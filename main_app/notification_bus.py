@@ -0,0 +1,174 @@
+# main_app/notification_bus.py
+"""In-process pub/sub feeding the server-sent notification stream.
+
+Notifications are written by the process_notifications worker and by any
+web process, so events cannot come from the writers themselves. Instead,
+while a process has subscribers, one feed thread polls DashboardNotification
+and publishes what changed: each row above the last id seen, and a read
+event when a subscriber's unread count goes down. Each event carries the
+subscriber's new unread count. That costs two indexed queries per poll per
+process, however many clients are connected.
+
+Subscribers are the async SSE responses of the stream process (asgi.py,
+see the Procfile). Every subscription owns an asyncio queue on its own
+event loop, and events are handed over with ``call_soon_threadsafe``. Swap
+the broker with ``set_broker()`` for a local stand-in in tests.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+from django.db.models import Count, Max
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_QUEUE_SIZE = 100
+FEED_POLL_SECONDS = 2
+FEED_BATCH_SIZE = 200
+
+
+class Subscription:
+    """One connected client; iterate with ``await subscription.get()``."""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client only misses intermediate events; the next
+            # one it receives triggers a full refresh anyway.
+            logger.warning("Notification stream queue full for user %s", self.user_id)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Route events to the subscriptions of one user, or to everyone."""
+
+    def __init__(self, poll_seconds=FEED_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # user_id -> set of Subscription
+        self._feed = None  # thread polling the database, while anyone is subscribed
+
+    def subscribe(self, user_id):
+        """Must be called from the event loop that will consume the events."""
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+            if self._feed is None:
+                self._feed = threading.Thread(target=self._follow, name='notification-feed', daemon=True)
+                self._feed.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, event, user_id=None):
+        """Deliver `event` to `user_id`'s clients, or to all clients if None."""
+        with self._lock:
+            if user_id is None:
+                targets = [s for subs in self._subscriptions.values() for s in subs]
+            else:
+                targets = list(self._subscriptions.get(user_id, ()))
+        for subscription in targets:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:  # event loop already closed
+                self.unsubscribe(subscription)
+
+    def _subscribed_users(self):
+        """Ids with a live subscription; stops the feed when there are none."""
+        with self._lock:
+            if not self._subscriptions:
+                self._feed = None
+            return list(self._subscriptions)
+
+    def _follow(self):
+        last_id = counts = None
+        while True:
+            user_ids = self._subscribed_users()
+            if not user_ids:
+                return
+            try:
+                if last_id is None:
+                    last_id = _latest_notification_id()
+                last_id, counts = self._poll(user_ids, last_id, counts)
+            except Exception:  # noqa: BLE001 - keep following once the database is back
+                logger.exception("Notification feed poll failed")
+            finally:
+                close_old_connections()
+            time.sleep(self.poll_seconds)
+
+    def _poll(self, user_ids, last_id, previous):
+        """Publish new rows and drops in unread counts; returns (last id, counts).
+
+        Every event carries the subscriber's unread count (own + system), so
+        the streams themselves never query. A row whose transaction commits
+        after a higher id was seen is not streamed on its own; the client
+        still picks it up on its next refresh.
+        """
+        from .models import DashboardNotification
+        from .notification_service import NotificationService, serialize_notification
+
+        system_id = NotificationService.get_system_user_id()
+        new = list(
+            DashboardNotification.objects.select_related('sender')
+            .filter(id__gt=last_id).order_by('id')[:FEED_BATCH_SIZE]
+        )
+        # Counted after fetching the rows, so the counts include all of them
+        unread = dict.fromkeys(user_ids + [system_id], 0)
+        unread.update(
+            DashboardNotification.objects.filter(recipient_id__in=unread, is_read=False)
+            .order_by().values('recipient_id').annotate(count=Count('id'))
+            .values_list('recipient_id', 'count')
+        )
+        counts = {user_id: unread[user_id] + unread[system_id] for user_id in user_ids}
+
+        serialized = [(n.recipient_id, serialize_notification(n)) for n in new]
+        for user_id in user_ids:
+            count = counts[user_id]
+            mine = [data for recipient_id, data in serialized if recipient_id in (user_id, system_id)]
+            for data in mine:
+                self.publish({'event': 'notification', 'data': data, 'count': count}, user_id=user_id)
+            if not mine and previous is not None and count < previous.get(user_id, count):
+                self.publish({'event': 'read', 'data': {}, 'count': count}, user_id=user_id)
+        return (new[-1].id if new else last_id), counts
+
+
+def _latest_notification_id():
+    from .models import DashboardNotification
+    return DashboardNotification.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+_broker = InProcessBroker()
+
+
+def get_broker():
+    return _broker
+
+
+def set_broker(broker):
+    """Replace the active broker; returns the previous one."""
+    global _broker
+    previous, _broker = _broker, broker
+    return previous
@@ -0,0 +1,276 @@
+# main_app/notification_outbox.py
+"""Transactional outbox for dashboard notifications.
+
+Signal handlers and views call ``enqueue()``, which is a single INSERT in the
+caller's transaction. The ``process_notifications`` command drains pending
+rows in batches and runs the handler registered for each event. A handler
+failure rolls back that row's notifications and retries it later with
+exponential backoff. After ``MAX_ATTEMPTS`` the row is marked failed and
+keeps its last error.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (CustomUser, FeedbackStaff, FeedbackStudent,
+                     LeaveReportStaff, LeaveReportStudent, NotificationOutbox,
+                     StudentResult)
+from .notification_service import NotificationService, get_admin_user_ids
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+HANDLERS = {}
+
+
+def outbox_handler(event):
+    """Register the function that renders notifications for `event`."""
+    def register(func):
+        HANDLERS[event] = func
+        return func
+    return register
+
+
+def enqueue(event, **payload):
+    """Append one outbox row; `payload` must be JSON serialisable."""
+    return NotificationOutbox.objects.create(event=event, payload=payload)
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def pending_ids(batch_size):
+    return list(
+        NotificationOutbox.objects.filter(
+            status=NotificationOutbox.PENDING, available_at__lte=timezone.now()
+        ).order_by('available_at', 'id').values_list('id', flat=True)[:batch_size]
+    )
+
+
+def process_entry(entry_id, max_attempts=MAX_ATTEMPTS):
+    """Run one outbox row; returns its new status, or None if another worker has it."""
+    with transaction.atomic():
+        entry = (
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(pk=entry_id, status=NotificationOutbox.PENDING).first()
+        )
+        if entry is None:
+            return None
+        try:
+            with transaction.atomic():
+                HANDLERS[entry.event](**entry.payload)
+        except Exception as exc:  # noqa: BLE001
+            entry.attempts += 1
+            entry.last_error = f"{type(exc).__name__}: {exc}"
+            if entry.attempts >= max_attempts:
+                entry.status = NotificationOutbox.FAILED
+                logger.error("Notification outbox %s (%s) failed permanently: %s",
+                             entry.id, entry.event, entry.last_error)
+            else:
+                entry.available_at = timezone.now() + backoff_delay(entry.attempts)
+                logger.warning("Notification outbox %s (%s) failed, retry %s: %s",
+                               entry.id, entry.event, entry.attempts, entry.last_error)
+        else:
+            entry.status = NotificationOutbox.DONE
+            entry.processed_at = timezone.now()
+        entry.save()
+        return entry.status
+
+
+def process_batch(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """Process up to `batch_size` due rows; returns (done, retried, failed)."""
+    done = retried = failed = 0
+    for entry_id in pending_ids(batch_size):
+        status = process_entry(entry_id, max_attempts)
+        if status == NotificationOutbox.DONE:
+            done += 1
+        elif status == NotificationOutbox.PENDING:
+            retried += 1
+        elif status == NotificationOutbox.FAILED:
+            failed += 1
+    return done, retried, failed
+
+
+# ---------- handlers ----------
+# Objects deleted before the worker got to them have nothing left to announce.
+
+@outbox_handler("leave_student")
+def leave_student(leave_id):
+    leave = LeaveReportStudent.objects.select_related('student__admin').filter(pk=leave_id).first()
+    if leave is None:
+        return
+    student_user = leave.student.admin
+
+    # 1. Notify Student
+    NotificationService.create_notification(
+        recipient=student_user,
+        notification_type="leave_student",
+        title="Leave Request Submitted",
+        message=f"Your leave request for {leave.date} has been submitted.",
+        related_id=leave.id,
+        fail_silently=False,
+    )
+
+    # 2. Notify All Admins
+    NotificationService.fan_out(
+        get_admin_user_ids(),
+        notification_type="admin_notification",
+        title="New Student Leave Request",
+        message=f"{student_user.first_name} {student_user.last_name} submitted a leave request for {leave.date}.",
+        sender=student_user,
+        related_id=leave.id,
+        fail_silently=False,
+    )
+
+
+@outbox_handler("leave_staff")
+def leave_staff(leave_id):
+    leave = LeaveReportStaff.objects.select_related('staff__admin').filter(pk=leave_id).first()
+    if leave is None:
+        return
+    staff_user = leave.staff.admin
+
+    # 1. Notify Staff
+    NotificationService.create_notification(
+        recipient=staff_user,
+        notification_type="leave_staff",
+        title="Leave Request Submitted",
+        message=f"Your leave request for {leave.date} has been submitted.",
+        related_id=leave.id,
+        fail_silently=False,
+    )
+
+    # 2. Notify All Admins
+    NotificationService.fan_out(
+        get_admin_user_ids(),
+        notification_type="admin_notification",
+        title="New Staff Leave Request",
+        message=f"{staff_user.first_name} {staff_user.last_name} submitted a leave request for {leave.date}.",
+        sender=staff_user,
+        related_id=leave.id,
+        fail_silently=False,
+    )
+
+
+@outbox_handler("feedback_student")
+def feedback_student(feedback_id):
+    feedback = FeedbackStudent.objects.select_related('student__admin').filter(pk=feedback_id).first()
+    if feedback is None:
+        return
+    student_user = feedback.student.admin
+
+    # 1. Notify Student
+    NotificationService.create_notification(
+        recipient=student_user,
+        notification_type="feedback_student",
+        title="Feedback Sent",
+        message="Your feedback has been sent to the administration.",
+        related_id=feedback.id,
+        fail_silently=False,
+    )
+
+    # 2. Notify All Admins
+    NotificationService.fan_out(
+        get_admin_user_ids(),
+        notification_type="admin_notification",
+        title="New Student Feedback",
+        message=f"{student_user.first_name} {student_user.last_name} submitted feedback.",
+        sender=student_user,
+        related_id=feedback.id,
+        fail_silently=False,
+    )
+
+
+@outbox_handler("feedback_staff")
+def feedback_staff(feedback_id):
+    feedback = FeedbackStaff.objects.select_related('staff__admin').filter(pk=feedback_id).first()
+    if feedback is None:
+        return
+    staff_user = feedback.staff.admin
+    NotificationService.fan_out(
+        get_admin_user_ids(),
+        notification_type="feedback_staff",
+        title="New Staff Feedback",
+        message=f"{staff_user.get_full_name()} submitted feedback.",
+        sender=staff_user,
+        related_id=feedback.id,
+        fail_silently=False,
+    )
+
+
+@outbox_handler("result_update")
+def result_update(result_id):
+    result = (
+        StudentResult.objects.select_related('student__admin', 'subject__staff__admin')
+        .filter(pk=result_id).first()
+    )
+    if result is None:
+        return
+    student_user = result.student.admin
+    subject_staff = result.subject.staff
+
+    # 1. Notify Student
+    NotificationService.create_notification(
+        recipient=student_user,
+        notification_type="result_update",
+        title="Result Updated",
+        message=f"Your result for {result.subject.name} has been updated.",
+        sender=subject_staff.admin if subject_staff else None,
+        related_id=result.id,
+        fail_silently=False,
+    )
+
+    # 2. Notify Staff (success confirmation)
+    if subject_staff and subject_staff.admin:
+        NotificationService.create_notification(
+            recipient=subject_staff.admin,
+            notification_type="result_update",
+            title="Result Update Successful",
+            message=f"You successfully updated result for {student_user.first_name} {student_user.last_name} in {result.subject.name}.",
+            related_id=result.id,
+            fail_silently=False,
+        )
+
+
+@outbox_handler("staff_result")
+def staff_result(result_id, sender_id):
+    result = StudentResult.objects.select_related('student__admin', 'subject').filter(pk=result_id).first()
+    staff_user = CustomUser.objects.filter(pk=sender_id).first()
+    if result is None or staff_user is None:
+        return
+    student_user = result.student.admin
+    NotificationService.fan_out(
+        get_admin_user_ids(),
+        notification_type="admin_notification",
+        title="Result Updated by Staff",
+        message=f"{staff_user.first_name} {staff_user.last_name} updated result for {student_user.first_name} {student_user.last_name} in {result.subject.name}.",
+        sender=staff_user,
+        related_id=result.id,
+        fail_silently=False,
+    )
+
+
+@outbox_handler("holiday_added")
+def holiday_added(name, date):
+    NotificationService.create_system_notification(
+        notification_type='admin_notification',
+        title="New Holiday Added",
+        message=f"{name} on {date} has been declared.",
+        fail_silently=False,
+    )
+
+
+@outbox_handler("holiday_removed")
+def holiday_removed(name, date):
+    NotificationService.create_system_notification(
+        notification_type='admin_notification',
+        title="Holiday Removed",
+        message=f"{name} on {date} has been removed.",
+        fail_silently=False,
+    )
@@ -1,10 +1,11 @@
 # main_app/notification_service.py
 import logging
-import sys
+import time
 from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Q
 
 logger = logging.getLogger(__name__)
 
@@ -12,17 +13,32 @@ logger = logging.getLogger(__name__)
 # Track if signals already registered to prevent duplicates
 _SIGNALS_REGISTERED = False
 
+# Sentinel recipient for broadcast notifications (created by migration 0003)
+SYSTEM_USER_EMAIL = 'system@college.edu'
+_SYSTEM_USER_ID = None
+
+# Per-recipient version, bumped whenever that recipient's unread notifications
+# change; the notification API derives its ETags from it.
+NOTIFICATION_VERSION_KEY = 'main_app:notification_version:{}'
+
 def get_admin_users():
     """Get all active HOD/Admin users (user_type=1)"""
     try:
         from .models import CustomUser
         return CustomUser.objects.filter(user_type=1, is_active=True)
     except Exception as exc:
-        import logging
-        logger = logging.getLogger(__name__)
         logger.exception("get_admin_users failed: %s", exc)
         return []
 
+def get_admin_user_ids():
+    """Ids of all active HOD/Admin users, for NotificationService.fan_out"""
+    try:
+        from .models import CustomUser
+        return list(CustomUser.objects.filter(user_type=1, is_active=True).values_list('id', flat=True))
+    except Exception as exc:
+        logger.exception("get_admin_user_ids failed: %s", exc)
+        return []
+
 def register_signals_once():
     """Register all notification signals only once"""
     global _SIGNALS_REGISTERED
@@ -31,153 +47,44 @@ def register_signals_once():
     
     logger.info("🔔 Registering notification signals...")
         
-    @receiver(post_save, sender="main_app.LeaveReportStudent")
+    # Each receiver only appends one NotificationOutbox row; the
+    # process_notifications command renders the notifications later.
+    from .notification_outbox import enqueue
+
+    # 1. student leave request --------------------------------------------------
+    @receiver(post_save, sender="main_app.LeaveReportStudent", weak=False)
     def notify_student_leave(sender, instance, created, **kwargs):
-        if not created:
-            return
-
-        # 1. Notify Student (existing)
-        NotificationService.create_notification(
-            recipient=instance.student.admin,
-            notification_type="leave_student",
-            title="Leave Request Submitted",
-            message=f"Your leave request for {instance.date} has been submitted.",
-            related_id=instance.id,
-        )
-
-        # 2. Notify All Admins
-        admin_users = get_admin_users()  # Use the standalone function
-
-        for admin in admin_users:
-            NotificationService.create_notification(
-                recipient=admin,
-                notification_type="admin_notification",
-                title="New Student Leave Request",
-                message=f"{instance.student.admin.first_name} {instance.student.admin.last_name} submitted a leave request for {instance.date}.",
-                sender=instance.student.admin,
-                related_id=instance.id,
-            )
+        if created:
+            enqueue("leave_student", leave_id=instance.id)
     
     # 2. staff leave request ----------------------------------------------------
-    @receiver(post_save, sender="main_app.LeaveReportStaff")
+    @receiver(post_save, sender="main_app.LeaveReportStaff", weak=False)
     def notify_staff_leave(sender, instance, created, **kwargs):
-        if not created:
-            return
-
-        # 1. Notify Staff
-        NotificationService.create_notification(
-            recipient=instance.staff.admin,
-            notification_type="leave_staff",
-            title="Leave Request Submitted",
-            message=f"Your leave request for {instance.date} has been submitted.",
-            related_id=instance.id,
-        )
-
-        # 2. Notify All Admins
-        admin_users = get_admin_users()
-
-        for admin in admin_users:
-            NotificationService.create_notification(
-                recipient=admin,
-                notification_type="admin_notification",
-                title="New Staff Leave Request",
-                message=f"{instance.staff.admin.first_name} {instance.staff.admin.last_name} submitted a leave request for {instance.date}.",
-                sender=instance.staff.admin,
-                related_id=instance.id,
-            )
+        if created:
+            enqueue("leave_staff", leave_id=instance.id)
 
     # 3. student feedback -------------------------------------------------------
-    @receiver(post_save, sender="main_app.FeedbackStudent")
+    @receiver(post_save, sender="main_app.FeedbackStudent", weak=False)
     def notify_student_feedback(sender, instance, created, **kwargs):
-        if not created:
-            return
-        
-        # 1. Notify Student
-        NotificationService.create_notification(
-            recipient=instance.student.admin,
-            notification_type="feedback_student",
-            title="Feedback Sent",
-            message="Your feedback has been sent to the administration.",
-            related_id=instance.id,
-        )
-        
-        # 2. Notify All Admins
-        admin_users = get_admin_users()
-        
-        for admin in admin_users:
-            NotificationService.create_notification(
-                recipient=admin,
-                notification_type="admin_notification",
-                title="New Student Feedback",
-                message=f"{instance.student.admin.first_name} {instance.student.admin.last_name} submitted feedback.",
-                sender=instance.student.admin,
-                related_id=instance.id,
-            )
-    
-    # 4. staff feedback ---------------------------------------------------------
-    @receiver(post_save, sender="main_app.StudentResult")
-    def notify_result_update(sender, instance, created, **kwargs):
-        if created:  # Only notify on updates, not creation
-            return
-
-        # 1. Notify Student (existing)
-        subject_staff = instance.subject.staff
-        NotificationService.create_notification(
-            recipient=instance.student.admin,
-            notification_type="result_update",
-            title="Result Updated",
-            message=f"Your result for {instance.subject.name} has been updated.",
-            sender=subject_staff.admin if subject_staff else None,
-            related_id=instance.id,
-        )
-
-        # 2. NEW: Notify Staff (success confirmation)
-        if subject_staff and subject_staff.admin:
-            NotificationService.create_notification(
-                recipient=subject_staff.admin,
-                notification_type="result_update",
-                title="Result Update Successful",
-                message=f"You successfully updated result for {instance.student.admin.first_name} {instance.student.admin.last_name} in {instance.subject.name}.",
-                related_id=instance.id,
-            )
+        if created:
+            enqueue("feedback_student", feedback_id=instance.id)
     
-    # 5. result update ----------------------------------------------------------
-    @receiver(post_save, sender="main_app.StudentResult")
+    # 4. result update ----------------------------------------------------------
+    @receiver(post_save, sender="main_app.StudentResult", weak=False)
     def notify_result_update(sender, instance, created, **kwargs):
-        if created:  # we only notify on *update*
-            return
-        from .notification_service import NotificationService
-        subject_staff = instance.subject.staff
-        NotificationService.create_notification(
-            recipient=instance.student.admin,
-            notification_type="result_update",
-            title="Result Updated",
-            message=f"Your result for {instance.subject.name} has been updated.",
-            sender=subject_staff.admin if subject_staff else None,
-            related_id=instance.id,
-        )
+        if not created:  # Only notify on updates, not creation
+            enqueue("result_update", result_id=instance.id)
     
-    # 6. holiday added ----------------------------------------------------------
-    @receiver(post_save, sender="main_app.Holiday")
+    # 5. holiday added ----------------------------------------------------------
+    @receiver(post_save, sender="main_app.Holiday", weak=False)
     def holiday_added(sender, instance, created, **kwargs):
-        if not created:
-            return
-        from .notification_service import NotificationService
-        NotificationService.create_system_notification(
-            notification_type='admin_notification',
-            title="New Holiday Added",
-            message=f"{instance.name} on {instance.date} has been declared."
-        )
+        if created:
+            enqueue("holiday_added", name=instance.name, date=str(instance.date))
     
-    # 7. holiday removed -------------------------------------------------------
-    @receiver(post_delete, sender="main_app.Holiday")
+    # 6. holiday removed -------------------------------------------------------
+    @receiver(post_delete, sender="main_app.Holiday", weak=False)
     def holiday_removed(sender, instance, **kwargs):
-        from .notification_service import NotificationService
-        NotificationService.create_system_notification(
-            notification_type='admin_notification',
-            title="Holiday Removed",
-            message=f"{instance.name} on {instance.date} has been removed."
-        )
+        enqueue("holiday_removed", name=instance.name, date=str(instance.date))
     
     _SIGNALS_REGISTERED = True
     logger.info("✅ Notification signals registered successfully")
@@ -189,6 +96,43 @@ def get_model(model_name: str):
     return apps.get_model("main_app", model_name)
 
 
+def serialize_notification(notification):
+    """JSON-friendly dict used by the notification API and the live stream."""
+    return {
+        'id': notification.id,
+        'type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'sender': notification.sender_name,
+        'created_at': notification.created_at.strftime('%Y-%m-%d %H:%M'),
+        'is_read': notification.is_read,
+        'related_id': notification.related_id,
+    }
+
+
+def get_notification_versions(*recipient_ids):
+    """Current version of each recipient's notifications, in one cache call."""
+    keys = [NOTIFICATION_VERSION_KEY.format(rid) for rid in recipient_ids]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from the clock so a flushed cache never reuses an old ETag
+            version = time.time_ns()
+            versions[key] = version if cache.add(key, version, None) else cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def notifications_changed(*recipient_ids):
+    """Bump the recipients' versions once the write commits.
+
+    The versions never expire and are replaced rather than incremented, since
+    incr() re-stores the value with the default timeout on the database cache.
+    """
+    keys = {NOTIFICATION_VERSION_KEY.format(rid) for rid in recipient_ids}
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time_ns()), None))
+
+
 # ---------- service ----------
 class NotificationService:
     """Central place to create / query dashboard notifications."""
@@ -198,7 +142,8 @@ class NotificationService:
     # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
     @staticmethod
     def create_notification(
-        recipient, notification_type, title, message, sender=None, related_id=None
+        recipient, notification_type, title, message, sender=None, related_id=None,
+        fail_silently=True,
     ):
         """Create and return a DashboardNotification row."""
         try:
@@ -212,19 +157,65 @@ class NotificationService:
                 related_id=related_id,
             )
         except Exception as exc:  # noqa: BLE001
+            if not fail_silently:
+                raise
             logger.exception("create_notification failed: %s", exc)
             return None
 
     @staticmethod
-    def get_unread_notifications(user):
-        """Return QS with unread notifications for user + system (newest first)."""
+    def fan_out(
+        recipients, notification_type, title, message, sender=None, related_id=None,
+        fail_silently=True,
+    ):
+        """Send one notification to many recipients with a single INSERT.
+
+        `recipients` may be users or user ids. bulk_create sends no post_save,
+        so the recipients' versions are bumped here. Returns the created rows.
+        """
         try:
             DashboardNotification = get_model("DashboardNotification")
+            recipient_ids = list(dict.fromkeys(getattr(r, "pk", r) for r in recipients))
+            notifications = DashboardNotification.objects.bulk_create([
+                DashboardNotification(
+                    recipient_id=recipient_id,
+                    sender=sender,
+                    notification_type=notification_type,
+                    title=title,
+                    message=message,
+                    related_id=related_id,
+                )
+                for recipient_id in recipient_ids
+            ])
+            notifications_changed(*recipient_ids)
+            return notifications
+        except Exception as exc:  # noqa: BLE001
+            if not fail_silently:
+                raise
+            logger.exception("fan_out failed: %s", exc)
+            return []
+
+    @staticmethod
+    def get_system_user_id():
+        """Id of the sentinel system user (created by migration 0003), looked up once per process."""
+        global _SYSTEM_USER_ID
+        if _SYSTEM_USER_ID is None:
             from django.contrib.auth import get_user_model
             User = get_user_model()
-            system = User.objects.get(email='system@college.edu')
+            _SYSTEM_USER_ID = User.objects.values_list('id', flat=True).get(email=SYSTEM_USER_EMAIL)
+        return _SYSTEM_USER_ID
+
+    @staticmethod
+    def recipient_ids(user):
+        """Recipients whose notifications `user` sees: themselves + system."""
+        return (user.id, NotificationService.get_system_user_id())
+
+    @staticmethod
+    def get_unread_notifications(user):
+        """Return QS with unread notifications for user + system (newest first)."""
+        try:
+            DashboardNotification = get_model("DashboardNotification")
             return DashboardNotification.objects.filter(
-                Q(recipient=user) | Q(recipient=system),
+                recipient_id__in=NotificationService.recipient_ids(user),
                 is_read=False
             ).order_by("-created_at")
         except Exception as exc:  # noqa: BLE001
@@ -236,11 +227,8 @@ class NotificationService:
         """Unread count for user + system."""
         try:
             DashboardNotification = get_model("DashboardNotification")
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            system = User.objects.get(email='system@college.edu')
             return DashboardNotification.objects.filter(
-                Q(recipient=user) | Q(recipient=system),
+                recipient_id__in=NotificationService.recipient_ids(user),
                 is_read=False
             ).count()
         except Exception as exc:  # noqa: BLE001
@@ -252,31 +240,49 @@ class NotificationService:
         """Mark every unread notification for user + system as read."""
         try:
             DashboardNotification = get_model("DashboardNotification")
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            system = User.objects.get(email='system@college.edu')
-            return DashboardNotification.objects.filter(
-                Q(recipient=user) | Q(recipient=system),
+            recipient_ids = NotificationService.recipient_ids(user)
+            marked = DashboardNotification.objects.filter(
+                recipient_id__in=recipient_ids,
                 is_read=False
             ).update(is_read=True)
+            if marked:
+                notifications_changed(*recipient_ids)
+            return marked
         except Exception as exc:  # noqa: BLE001
             logger.exception("mark_all_as_read failed: %s", exc)
             return 0
 
     @staticmethod
-    def create_system_notification(notification_type, title, message, related_id=None):
+    def create_system_notification(
+        notification_type, title, message, related_id=None, fail_silently=True
+    ):
         """Create a single notification row attached to sentinel user."""
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        system, _ = User.objects.get_or_create(email='system@college.edu', defaults={'first_name': 'System'})
-        return NotificationService.create_notification(
-            recipient=system,
-            notification_type=notification_type,
-            title=title,
-            message=message,
-            sender=None,
-            related_id=related_id,
-        )
+        try:
+            DashboardNotification = get_model("DashboardNotification")
+            return DashboardNotification.objects.create(
+                recipient_id=NotificationService.get_system_user_id(),
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                related_id=related_id,
+            )
+        except Exception as exc:  # noqa: BLE001
+            if not fail_silently:
+                raise
+            logger.exception("create_system_notification failed: %s", exc)
+            return None
+
+@receiver(post_save, sender="main_app.DashboardNotification")
+def notification_saved(sender, instance, **kwargs):
+    # create_notification, create_system_notification and mark_as_read
+    notifications_changed(instance.recipient_id)
+
+
+@receiver(post_delete, sender="main_app.CustomUser")
+def forget_system_user(sender, instance, **kwargs):
+    global _SYSTEM_USER_ID
+    if instance.pk == _SYSTEM_USER_ID:
+        _SYSTEM_USER_ID = None
 
 # ========== AUTOMATIC SIGNAL REGISTRATION ==========
 # Call this once when module loads
@@ -1,16 +1,38 @@
+import asyncio
 import json
 import logging                       # <--- 1.  std-lib imports first
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.apps import apps
 from django.shortcuts import render
 from django.template.loader import render_to_string
 
-from .notification_service import NotificationService   # <--- 2.  your code
+from .notification_bus import get_broker
+from .notification_service import (   # <--- 2.  your code
+    NotificationService, get_notification_versions, serialize_notification,
+)
 
 logger = logging.getLogger(__name__)       
 
+def notification_etag(request):
+    """ETag from the notification versions of user + system.
+
+    The versions live in the shared cache and are bumped by every write, so
+    a poll with a current If-None-Match costs one cache read and is answered
+    304 without touching the notification table.
+    """
+    versions = get_notification_versions(*NotificationService.recipient_ids(request.user))
+    return '-'.join(str(v) for v in [request.user.pk, *versions])
+
+
+notification_etag_condition = condition(etag_func=notification_etag)
+
+STREAM_KEEPALIVE_SECONDS = 25
+
 # Get models dynamically to avoid circular imports
 def get_model(model_name):
     try:
@@ -21,6 +43,7 @@ def get_model(model_name):
 # ========== NOTIFICATION API VIEWS ==========
 
 @login_required
+@notification_etag_condition
 def get_dashboard_notifications(request):
     """Get dashboard notifications for the current user"""
     try:
@@ -28,18 +51,10 @@ def get_dashboard_notifications(request):
         
         notifications = NotificationService.get_unread_notifications(request.user)
         
-        notification_data = []
-        for notification in notifications[:10]:  # Get latest 10
-            notification_data.append({
-                'id': notification.id,
-                'type': notification.notification_type,
-                'title': notification.title,
-                'message': notification.message,
-                'sender': notification.sender_name,
-                'created_at': notification.created_at.strftime('%Y-%m-%d %H:%M'),
-                'is_read': notification.is_read,
-                'related_id': notification.related_id
-            })
+        notification_data = [
+            serialize_notification(notification)
+            for notification in notifications[:10]  # Get latest 10
+        ]
         
         return JsonResponse({
             'success': True,
@@ -57,20 +72,12 @@ def mark_notification_read(request, notification_id):
     """Mark a notification as read"""
     try:
         DashboardNotification = apps.get_model('main_app', 'DashboardNotification')
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        
-        # Get the system user
-        try:
-            system_user = User.objects.get(email='system@college.edu')
-        except User.DoesNotExist:
-            system_user = None
-        
+
         # Get notification - allow either user's own OR system notifications
         notification = DashboardNotification.objects.get(id=notification_id)
         
         # Check if user is authorized to mark this as read
-        if notification.recipient == request.user or notification.recipient == system_user:
+        if notification.recipient_id in NotificationService.recipient_ids(request.user):
             notification.mark_as_read()
             return JsonResponse({'success': True})
         else:
@@ -108,6 +115,7 @@ def mark_all_notifications_read(request):
         }, status=500)
 
 @login_required
+@notification_etag_condition
 def get_notification_count(request):
     """Get unread notification count"""
     try:
@@ -124,6 +132,48 @@ def get_notification_count(request):
             'error': str(e)
         }, status=500)
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@login_required
+async def notification_stream(request):
+    """Server-Sent Events feed of new notifications and unread-count changes.
+
+    Served by the ASGI stream process; the WSGI web workers answer 204 so
+    the browser's EventSource gives up and the page falls back to
+    conditional polling. Counts come with the broker's events, so an open
+    stream runs no queries of its own after the first one.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    # Off the thread-sensitive executor, so it never queues behind other views
+    get_count = sync_to_async(NotificationService.get_notification_count, thread_sensitive=False)
+
+    async def events():
+        # Subscribed on first iteration, so a response that is never
+        # consumed leaves nothing registered with the broker
+        subscription = get_broker().subscribe(user.id)
+        try:
+            yield _sse('count', {'count': await get_count(user)})
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event['event'], event['data'])
+                yield _sse('count', {'count': event['count']})
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # ========== DASHBOARD NOTIFICATION WIDGET VIEWS ==========
 
 @login_required
@@ -133,6 +183,7 @@ def dashboard_notifications_widget(request):
 
 
 @login_required
+@notification_etag_condition
 def get_user_notifications_html(request):
     try:
         notifications = NotificationService.get_unread_notifications(request.user)[:5]
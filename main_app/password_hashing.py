@@ -0,0 +1,50 @@
+# main_app/password_hashing.py
+"""Hash many passwords on all cores for the bulk user-creation paths.
+
+PBKDF2 is deliberately slow: with Django 5's iteration count it takes close
+to half a second per password, which makes hashing the dominant cost of a
+large import. hash_passwords() spreads the work over a process pool, which
+speeds up any configured hasher, whether or not it releases the GIL. It
+yields the hashes in input order while later ones are still being computed,
+so the caller can insert the first chunk of users while the pool keeps going.
+"""
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+# Below this many passwords, starting the pool costs more than it saves
+PARALLEL_HASH_MIN = 64
+HASH_CHUNKSIZE = 16  # passwords sent to a worker per round trip
+
+
+def hash_workers():
+    """Worker count: settings.PASSWORD_HASH_WORKERS, or one per available core."""
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None)
+    if workers:
+        return workers
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        return os.cpu_count() or 1
+
+
+def _init_worker(settings_module):
+    # Spawned (not forked) workers start without Django configured
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup(set_prefix=False)
+
+
+def hash_passwords(passwords, workers=None):
+    """Yield make_password(p) for each password, in order."""
+    passwords = list(passwords)
+    workers = min(workers or hash_workers(), len(passwords))
+    if workers <= 1 or len(passwords) < PARALLEL_HASH_MIN:
+        yield from map(make_password, passwords)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', ''),)) as pool:
+        yield from pool.map(make_password, passwords, chunksize=HASH_CHUNKSIZE)
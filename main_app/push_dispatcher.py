@@ -0,0 +1,145 @@
+# main_app/push_dispatcher.py
+"""Firebase push notifications, sent by the notification worker.
+
+Views call ``queue_push()``, which only appends an outbox row. The
+``process_notifications`` worker resolves the audience to FCM tokens with one
+query. It then posts them over a shared keep-alive session, up to
+``MULTICAST_LIMIT`` tokens per request.
+
+Requests use ``settings.FCM_TIMEOUT``. Connection errors and 429/5xx
+responses are retried by the session adapter with backoff. Anything still
+failing raises, so the outbox reschedules the row. Tokens that FCM reports
+as unregistered are cleared from their users. Without
+``settings.FCM_SERVER_KEY`` (read from the environment) nothing is sent.
+"""
+import logging
+import threading
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.templatetags.static import static
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .models import CustomUser
+from .notification_outbox import enqueue, outbox_handler
+
+logger = logging.getLogger(__name__)
+
+PUSH_TITLE = "Student Management System"
+MULTICAST_LIMIT = 1000  # FCM's cap on registration_ids per request
+STALE_TOKEN_ERRORS = {'NotRegistered', 'InvalidRegistration', 'MismatchSenderId'}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide pooled session with FCM auth headers and retries."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=settings.FCM_MAX_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['POST']),
+            )
+            adapter = HTTPAdapter(pool_maxsize=10, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({
+                'Authorization': f'key={settings.FCM_SERVER_KEY}',
+                'Content-Type': 'application/json',
+            })
+            _session = session
+    return _session
+
+
+def queue_push(message, click_action='', user_ids=None, user_type=None,
+               course_id=None, session_id=None):
+    """Queue a push to the matching users; filters combine with AND.
+
+    `user_type` is '2' (staff) or '3' (students). `session_id` only applies
+    to students; `course_id` matches students and staff of that course.
+    """
+    return enqueue(
+        'push', message=message, click_action=click_action,
+        user_ids=list(user_ids) if user_ids is not None else None,
+        user_type=user_type, course_id=course_id, session_id=session_id,
+    )
+
+
+def audience_tokens(user_ids=None, user_type=None, course_id=None, session_id=None):
+    users = CustomUser.objects.filter(is_active=True).exclude(fcm_token='')
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    if user_type:
+        users = users.filter(user_type=user_type)
+    if session_id:
+        users = users.filter(student__session_id=session_id)
+    if course_id:
+        if str(user_type) == '2':
+            users = users.filter(staff__course_id=course_id)
+        elif str(user_type) == '3' or session_id:
+            users = users.filter(student__course_id=course_id)
+        else:
+            users = users.filter(Q(student__course_id=course_id) | Q(staff__course_id=course_id))
+    return list(users.values_list('fcm_token', flat=True).distinct())
+
+
+def send_push(tokens, message, click_action=''):
+    """Post `message` to `tokens` in multicast chunks; returns (sent, failed).
+
+    If a later chunk fails, the remaining tokens are queued as a new push so
+    the chunks already delivered are not sent twice.
+    """
+    tokens = list(dict.fromkeys(token for token in tokens if token))
+    session = get_session()
+    notification = {
+        'title': PUSH_TITLE,
+        'body': message,
+        'click_action': click_action,
+        'icon': static('dist/img/AdminLTELogo.png'),
+    }
+    sent = failed = 0
+    stale = []
+    for start in range(0, len(tokens), MULTICAST_LIMIT):
+        chunk = tokens[start:start + MULTICAST_LIMIT]
+        try:
+            response = session.post(
+                settings.FCM_SEND_URL,
+                json={'notification': notification, 'registration_ids': chunk},
+                timeout=settings.FCM_TIMEOUT,
+            )
+            response.raise_for_status()
+            result = response.json()
+        except (requests.RequestException, ValueError):
+            if start == 0:
+                raise
+            logger.warning("FCM push failed after %s tokens; requeueing the remaining %s",
+                           start, len(tokens) - start, exc_info=True)
+            enqueue('push', message=message, click_action=click_action, tokens=tokens[start:])
+            break
+        sent += result.get('success', 0)
+        failed += result.get('failure', 0)
+        for token, outcome in zip(chunk, result.get('results', [])):
+            if outcome.get('error') in STALE_TOKEN_ERRORS:
+                stale.append(token)
+    if stale:
+        CustomUser.objects.filter(fcm_token__in=stale).update(fcm_token="")
+    return sent, failed
+
+
+@outbox_handler('push')
+def push(message, click_action='', tokens=None, **audience):
+    if not settings.FCM_SERVER_KEY:
+        logger.warning("FCM_SERVER_KEY is not set; dropping push %r", message)
+        return
+    if tokens is None:
+        tokens = audience_tokens(**audience)
+    if tokens:
+        sent, failed = send_push(tokens, message, click_action)
+        logger.info("FCM push delivered to %s devices (%s failed)", sent, failed)
@@ -1,16 +1,28 @@
 import json
 
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import (HttpResponseRedirect, get_object_or_404,redirect, render)
 from django.urls import reverse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 
+from .attendance_counters import record_new_reports, record_status_changes
 from .forms import *
 from .models import *
 
 
+def _parse_status(value):
+    """Coerce a posted attendance status (1/0, t/f, true/false in any case) to a bool."""
+    if isinstance(value, str):
+        # BooleanField only knows "True"/"False" spelled with a capital
+        value = {'true': True, 'false': False}.get(value.strip().lower(), value.strip())
+    return models.BooleanField().to_python(value)
+
+
 def staff_home(request):
     staff = get_object_or_404(Staff, admin=request.user)
     total_students = Student.objects.filter(course=staff.course).count()
@@ -79,13 +91,19 @@ def get_students(request):
 
 @csrf_exempt
 def save_attendance(request):
-    student_data = request.POST.get('student_ids')
+    """Save a whole register in one transaction.
+
+    Every student id is validated with a single ``in_bulk`` query and the
+    reports go in with one ``bulk_create``, so the cost no longer grows with
+    the class size. Errors are reported with status 200 so the ajax handler
+    can show them.
+    """
     date       = request.POST.get('date')
     subject_id = request.POST.get('subject')
     session_id = request.POST.get('session')
-    students   = json.loads(student_data)
 
     try:
+        students = json.loads(request.POST.get('student_ids') or '[]')
         session = get_object_or_404(Session, id=session_id)
         subject = get_object_or_404(Subject, id=subject_id)
 
@@ -94,26 +112,53 @@ def save_attendance(request):
         parsed_date = dt.strptime(date, "%Y-%m-%d").date()
         today = dt.utcnow().date()
         if parsed_date > today:
-            return HttpResponse("Future date not allowed", status=200)   # 200 so ajax shows it
+            return JsonResponse({'success': False, 'error': "Future date not allowed"})
 
-        if Attendance.objects.filter(session=session, subject=subject, date=date).exists():
-            return HttpResponse("Attendance already taken for this date", status=200)
-        # --- end validation ---
-
-        attendance = Attendance(session=session, subject=subject, date=date)
-        attendance.save()
+        if Attendance.objects.filter(session=session, subject=subject, date=parsed_date).exists():
+            return JsonResponse({'success': False, 'error': "Attendance already taken for this date"})
 
+        statuses = {}
+        errors = []
         for student_dict in students:
-            student = get_object_or_404(Student, id=student_dict.get('id'))
-            AttendanceReport.objects.create(
-                student=student,
-                attendance=attendance,
-                status=student_dict.get('status')
-            )
+            try:
+                statuses[int(student_dict.get('id'))] = _parse_status(student_dict.get('status'))
+            except (TypeError, ValueError, ValidationError):
+                errors.append({'id': student_dict.get('id'), 'error': "Invalid student id or status"})
+
+        known = Student.objects.only('id').in_bulk(list(statuses))
+        errors.extend(
+            {'id': student_id, 'error': "Student not found"}
+            for student_id in statuses if student_id not in known
+        )
+        if errors:
+            return JsonResponse({
+                'success': False,
+                'error': f"{len(errors)} student record(s) could not be saved",
+                'errors': errors,
+            })
+        if not statuses:
+            return JsonResponse({'success': False, 'error': "No students submitted"})
+        # --- end validation ---
+
+        present_ids = [sid for sid, status in statuses.items() if status]
+        absent_ids = [sid for sid, status in statuses.items() if not status]
+        with transaction.atomic():
+            attendance = Attendance.objects.create(session=session, subject=subject, date=parsed_date)
+            AttendanceReport.objects.bulk_create([
+                AttendanceReport(student_id=student_id, attendance=attendance, status=status)
+                for student_id, status in statuses.items()
+            ])
+            record_new_reports(subject.id, present_ids, absent_ids)
     except Exception as e:
-        return HttpResponse(str(e), status=200)   # real error text
+        return JsonResponse({'success': False, 'error': str(e)})   # real error text
 
-    return HttpResponse("OK")
+    return JsonResponse({
+        'success': True,
+        'attendance_id': attendance.id,
+        'saved': len(statuses),
+        'present': len(present_ids),
+        'absent': len(absent_ids),
+    })
 
 
 def staff_update_attendance(request):
@@ -153,22 +198,61 @@ def get_student_attendance(request):
 
 @csrf_exempt
 def update_attendance(request):
-    student_data = request.POST.get('student_ids')
-    date = request.POST.get('date')
-    students = json.loads(student_data)
+    """Apply corrections to a saved register.
+
+    All reports for the Attendance row are loaded in one query; only rows
+    whose status actually changed are written, with at most one UPDATE per
+    status.
+    """
     try:
-        attendance = get_object_or_404(Attendance, id=date)
+        students = json.loads(request.POST.get('student_ids') or '[]')
+        attendance = get_object_or_404(Attendance, id=request.POST.get('date'))
+
+        # admin (user) id -> (report id, student id, current status)
+        reports = {
+            admin_id: (report_id, student_id, status)
+            for report_id, student_id, admin_id, status in AttendanceReport.objects.filter(
+                attendance=attendance).values_list('id', 'student_id', 'student__admin_id', 'status')
+        }
 
+        errors = []
+        to_present, to_absent = {}, {}   # report id -> student id
         for student_dict in students:
-            student = get_object_or_404(
-                Student, admin_id=student_dict.get('id'))
-            attendance_report = get_object_or_404(AttendanceReport, student=student, attendance=attendance)
-            attendance_report.status = student_dict.get('status')
-            attendance_report.save()
+            try:
+                admin_id = int(student_dict.get('id'))
+                status = _parse_status(student_dict.get('status'))
+            except (TypeError, ValueError, ValidationError):
+                errors.append({'id': student_dict.get('id'), 'error': "Invalid student id or status"})
+                continue
+            if admin_id not in reports:
+                errors.append({'id': admin_id, 'error': "No attendance record for this student"})
+                continue
+            report_id, student_id, current = reports[admin_id]
+            if current != status:
+                (to_present if status else to_absent)[report_id] = student_id
+
+        if errors:
+            return JsonResponse({
+                'success': False,
+                'error': f"{len(errors)} student record(s) could not be updated",
+                'errors': errors,
+            })
+
+        now = timezone.now()
+        with transaction.atomic():
+            if to_present:
+                AttendanceReport.objects.filter(id__in=to_present).update(status=True, updated_at=now)
+            if to_absent:
+                AttendanceReport.objects.filter(id__in=to_absent).update(status=False, updated_at=now)
+            record_status_changes(attendance.subject_id, to_present.values(), to_absent.values())
     except Exception as e:
-        return None
+        return JsonResponse({'success': False, 'error': str(e)})
 
-    return HttpResponse("OK")
+    return JsonResponse({
+        'success': True,
+        'updated': len(to_present) + len(to_absent),
+        'unchanged': len(students) - len(to_present) - len(to_absent),
+    })
 
 
 def staff_apply_leave(request):
@@ -185,17 +269,7 @@ def staff_apply_leave(request):
                 obj = form.save(commit=False)
                 obj.staff = staff
                 obj.save()
-                            # ===== NOTIFY ALL ADMINS  =====
-                from main_app.notification_service import NotificationService
-                for admin_user in CustomUser.objects.filter(user_type=1):
-                    NotificationService.create_notification(
-                        recipient=admin_user,
-                        notification_type='leave_staff',
-                        title="New Staff Leave Request",
-                        message=f"{staff.admin.get_full_name()} applied for leave on {obj.date}.",
-                        sender=staff.admin,
-                        related_id=obj.id
-                    )
+                # Admins are notified by the LeaveReportStaff post_save handler
                 messages.success(
                     request, "Application for leave has been submitted for review")
                 return redirect(reverse('staff_apply_leave'))
@@ -221,16 +295,8 @@ def staff_feedback(request):
                 obj.staff = staff
                 obj.save()
                             # ===== NOTIFY ALL ADMINS  =====
-                from main_app.notification_service import NotificationService
-                for admin_user in CustomUser.objects.filter(user_type=1):
-                    NotificationService.create_notification(
-                        recipient=admin_user,
-                        notification_type='feedback_staff',
-                        title="New Staff Feedback",
-                        message=f"{staff.admin.get_full_name()} submitted feedback.",
-                        sender=staff.admin,
-                        related_id=obj.id
-                    )
+                from main_app.notification_outbox import enqueue
+                enqueue('feedback_staff', feedback_id=obj.id)
                 
                 messages.success(request, "Feedback submitted for review")
                 return redirect(reverse('staff_feedback'))
@@ -288,8 +354,9 @@ def staff_fcmtoken(request):
     token = request.POST.get('token')
     try:
         staff_user = get_object_or_404(CustomUser, id=request.user.id)
-        staff_user.fcm_token = token
-        staff_user.save()
+        if staff_user.fcm_token != token:
+            staff_user.fcm_token = token
+            staff_user.save(update_fields=['fcm_token'])
         return HttpResponse("True")
     except Exception as e:
         return HttpResponse("False")
@@ -357,17 +424,8 @@ def staff_add_result(request):
             messages.success(request, msg)
 
             # ===== DASHBOARD NOTIFICATION =====
-            from .notification_service import NotificationService
-            admin_users = NotificationService.get_admin_users()
-            for admin in admin_users:
-                NotificationService.create_notification(
-                    recipient=admin,
-                    notification_type="admin_notification",
-                    title="Result Updated by Staff",
-                    message=f"{request.user.first_name} {request.user.last_name} updated result for {student.admin.first_name} {student.admin.last_name} in {subject.name}.",
-                    sender=request.user,
-                    related_id=result.id,
-                )
+            from .notification_outbox import enqueue
+            enqueue('staff_result', result_id=result.id, sender_id=request.user.id)
 
         except Exception as e:
             messages.warning(request, "Error Occured While Processing Form")
@@ -0,0 +1,45 @@
+// Live notification updates for the dashboards.
+// Listens on the server-sent event stream and calls `refresh` whenever a
+// notification arrives or is read. If the stream is unavailable (WSGI
+// deployment, old browser, proxy dropping the connection) it falls back to
+// polling `refresh` every `pollInterval` ms; the notification endpoints
+// answer unchanged polls with 304 Not Modified.
+function startNotificationUpdates(streamUrl, refresh, pollInterval) {
+    var pollTimer = null;
+
+    function startPolling() {
+        if (!pollTimer) {
+            pollTimer = setInterval(refresh, pollInterval);
+        }
+    }
+
+    if (typeof EventSource === 'undefined') {
+        startPolling();
+        return;
+    }
+
+    var source = new EventSource(streamUrl);
+
+    source.addEventListener('notification', function() { refresh(); });
+    source.addEventListener('read', function() { refresh(); });
+    source.addEventListener('count', function(event) {
+        if (typeof updateUnreadCount === 'function') {
+            updateUnreadCount(JSON.parse(event.data).count);
+        }
+    });
+
+    source.onopen = function() {
+        if (pollTimer) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+    };
+
+    source.onerror = function() {
+        // CLOSED means the browser gave up (e.g. 204 from a WSGI worker);
+        // otherwise EventSource reconnects on its own.
+        if (source.readyState === EventSource.CLOSED) {
+            startPolling();
+        }
+    };
+}
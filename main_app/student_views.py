@@ -10,6 +10,7 @@ from django.shortcuts import (HttpResponseRedirect, get_object_or_404,
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 
+from .attendance_counters import student_attendance_by_subject
 from .forms import *
 from .models import *
 
@@ -17,8 +18,9 @@ from .models import *
 def student_home(request):
     student = get_object_or_404(Student, admin=request.user)
     total_subject = Subject.objects.filter(course=student.course).count()
-    total_attendance = AttendanceReport.objects.filter(student=student).count()
-    total_present = AttendanceReport.objects.filter(student=student, status=True).count()
+    counters = student_attendance_by_subject(student)
+    total_present = sum(row.present for row in counters.values())
+    total_attendance = sum(row.total for row in counters.values())
     if total_attendance == 0:  # Don't divide. DivisionByZero
         percent_absent = percent_present = 0
     else:
@@ -29,14 +31,10 @@ def student_home(request):
     data_absent = []
     subjects = Subject.objects.filter(course=student.course)
     for subject in subjects:
-        attendance = Attendance.objects.filter(subject=subject)
-        present_count = AttendanceReport.objects.filter(
-            attendance__in=attendance, status=True, student=student).count()
-        absent_count = AttendanceReport.objects.filter(
-            attendance__in=attendance, status=False, student=student).count()
+        row = counters.get(subject.id)
         subject_name.append(subject.name)
-        data_present.append(present_count)
-        data_absent.append(absent_count)
+        data_present.append(row.present if row else 0)
+        data_absent.append(row.absent if row else 0)
     context = {
         'total_attendance': total_attendance,
         'percent_present': percent_present,
@@ -180,8 +178,9 @@ def student_fcmtoken(request):
     token = request.POST.get('token')
     student_user = get_object_or_404(CustomUser, id=request.user.id)
     try:
-        student_user.fcm_token = token
-        student_user.save()
+        if student_user.fcm_token != token:
+            student_user.fcm_token = token
+            student_user.save(update_fields=['fcm_token'])
         return HttpResponse("True")
     except Exception as e:
         return HttpResponse("False")
@@ -1,3 +1,219 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.urls import reverse
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .chat_cache import cached_answer, topic_changed
+from .chat_intents import IntentRouter
+from .chat_views import EnhancedChatService
+from .management.commands.bench_chat_router import ROLES, ROUTING_CASES
+from .management.commands.check_chat_queries import ADMIN_QUERY_BUDGETS
+from .import_jobs import error_report_rows, run_job
+from .models import Course, CustomUser, ImportJob, Session, Staff, Subject
+from .notification_service import NotificationService
+
+
+class IntentRouterTests(SimpleTestCase):
+    def test_routing_cases(self):
+        for role, message, expected in ROUTING_CASES:
+            with self.subTest(role=role, message=message):
+                self.assertEqual(ROLES[role][0].route(message), expected)
+
+    def test_keywords_match_whole_words(self):
+        router = IntentRouter([('greeting', ['hi']), ('history', ['history'])])
+        self.assertEqual(router.route('this is history'), 'history')
+        self.assertIsNone(router.route('this'))
+
+    def test_plural_of_long_keywords(self):
+        router = IntentRouter([('results', ['result']), ('greeting', ['hi'])])
+        self.assertEqual(router.route('my results'), 'results')
+        self.assertIsNone(router.route('his'))
+
+    def test_earlier_rule_wins(self):
+        router = IntentRouter([('profile', ['profile']), ('attendance', ['attendance'])])
+        self.assertEqual(router.route('attendance on my profile'), 'profile')
+
+    def test_phrase_hiding_a_higher_priority_keyword_is_rejected(self):
+        with self.assertRaises(ValueError):
+            IntentRouter([('student_count', ['students']), ('totals', ['total students'])])
+
+
+FAST_HASHER = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class AdminChatQueryBudgetTests(TestCase):
+    """The admin chat answers run a fixed number of queries, whatever the data size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hod = CustomUser.objects.create_user(
+            email='hod@example.com', password='x', user_type=1,
+            first_name='Head', last_name='Admin', gender='M', address='x')
+        cls.add_school(2)
+
+    @classmethod
+    def add_school(cls, size):
+        start = Session.objects.count()
+        for i in range(start, start + size):
+            session = Session.objects.create(start_year=date(2000 + i, 1, 1), end_year=date(2001 + i, 1, 1))
+            course = Course.objects.create(name=f'Course {i}')
+            staff = CustomUser.objects.create_user(
+                email=f'staff{i}@example.com', password='x', user_type=2,
+                first_name='Staff', last_name=str(i), gender='F', address='x').staff
+            Subject.objects.create(name=f'Subject {i}', staff=staff, course=course)
+            for j in range(size):
+                student = CustomUser.objects.create_user(
+                    email=f'student{i}-{j}@example.com', password='x', user_type=3,
+                    first_name='Student', last_name=f'{i}-{j}', gender='M', address='x').student
+                student.course, student.session = course, session
+                student.save()
+
+    def assert_budgets(self):
+        service = EnhancedChatService()
+        user = CustomUser.objects.get(pk=self.hod.pk)
+        for intent, (build, budget) in ADMIN_QUERY_BUDGETS.items():
+            with self.subTest(intent=intent), self.assertNumQueries(budget):
+                answer = build(service, user)
+            self.assertNotEqual(answer.get('type'), 'error', intent)
+
+    def test_within_budget(self):
+        self.assert_budgets()
+
+    def test_budget_does_not_grow_with_data(self):
+        self.add_school(5)
+        self.assert_budgets()
+
+
+class ChatCacheTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser(id=1)
+        self.builds = 0
+
+    def build(self, user):
+        self.builds += 1
+        return {'type': 'text', 'build': self.builds}
+
+    def test_repeated_question_is_one_cache_read(self):
+        cached_answer(self.user, 'session', self.build)
+        with self.assertNumQueries(1):
+            answer = cached_answer(self.user, 'session', self.build)
+        self.assertEqual(answer['build'], 1)
+
+    def test_topic_change_invalidates(self):
+        cached_answer(self.user, 'session', self.build)
+        with self.captureOnCommitCallbacks(execute=True):
+            topic_changed('roster')
+        self.assertEqual(cached_answer(self.user, 'session', self.build)['build'], 2)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class NotificationEtagTests(TestCase):
+    """Unchanged polls are answered 304; every kind of write changes the ETag."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='hod@example.com', password='x', user_type=1,
+            first_name='Head', last_name='Admin', gender='M', address='x')
+        self.client.force_login(self.user)
+        self.url = reverse('get_notification_count')
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        return etag
+
+    def assert_changes_etag(self, write):
+        before = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertNotEqual(self.etag(), before)
+
+    def test_writes_change_the_etag(self):
+        create = NotificationService.create_notification
+        self.assert_changes_etag(lambda: create(self.user, 'admin_notification', 't', 'm'))
+        self.assert_changes_etag(lambda: NotificationService.fan_out([self.user], 'admin_notification', 't', 'm'))
+        self.assert_changes_etag(lambda: NotificationService.create_system_notification('admin_notification', 't', 'm'))
+        self.assert_changes_etag(lambda: NotificationService.mark_all_as_read(self.user))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class ExportStreamingTests(TestCase):
+    def setUp(self):
+        self.hod = CustomUser.objects.create_user(
+            email='hod@example.com', password='x', user_type=1,
+            first_name='Head', last_name='Admin', gender='M', address='x')
+        self.url = reverse('export_users_csv') + '?role=1'
+
+    def test_wsgi_export_streams_synchronously(self):
+        self.client.force_login(self.hod)
+        response = self.client.get(self.url)
+        self.assertFalse(response.is_async)
+        self.assertIn(b'hod@example.com', b''.join(response.streaming_content))
+
+    async def test_asgi_export_streams_asynchronously(self):
+        await self.async_client.aforce_login(self.hod)
+        response = await self.async_client.get(self.url)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b'hod@example.com', content)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class ImportJobTests(TestCase):
+    CSV = ("first_name,last_name,email,gender,address,Pass\r\n"
+           "Ann,One,ann@example.com,F,x,secret1\r\n"
+           "Bob,Two,bob@example.com,M,,secret2\r\n")
+
+    def setUp(self):
+        self.hod = CustomUser.objects.create_user(
+            email='hod@example.com', password='x', user_type=1,
+            first_name='Head', last_name='Admin', gender='M', address='x')
+
+    def run_import(self, source):
+        job = ImportJob.objects.create(role='1', filename='users.csv', source=source, created_by=self.hod)
+        run_job(job)
+        job.refresh_from_db()
+        return job
+
+    def test_passwords_are_not_kept(self):
+        job = self.run_import(self.CSV)
+        self.assertEqual(job.created, 1)
+        self.assertNotIn('secret', job.source)
+        report = list(error_report_rows(job))
+        self.assertEqual(report[0], ['line', 'error', 'first_name', 'last_name', 'email', 'gender', 'address'])
+        self.assertEqual([row[0] for row in report[1:]], [3])
+
+    def test_source_is_cleared_without_errors(self):
+        job = self.run_import(self.CSV.rsplit('Bob', 1)[0])
+        self.assertEqual(job.source, '')
+
+    def test_jobs_are_private_to_their_creator(self):
+        job = self.run_import(self.CSV)
+        other = CustomUser.objects.create_user(
+            email='other@example.com', password='x', user_type=1,
+            first_name='Other', last_name='Admin', gender='M', address='x')
+        self.client.force_login(other)
+        for name in ('import_job_status', 'import_job_errors'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name, args=[job.id])).status_code, 404)
+        self.client.force_login(self.hod)
+        self.assertEqual(self.client.get(reverse('import_job_status', args=[job.id])).status_code, 200)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class ProfileChangesTests(TestCase):
+    def test_fields_left_out_of_update_fields_stay_changed(self):
+        user = CustomUser.objects.create_user(
+            email='staff@example.com', password='x', user_type=2,
+            first_name='Staff', last_name='One', gender='F', address='x')
+        staff = Staff.objects.get(admin=user)
+        staff.phone = '0123456789'
+        staff.course = Course.objects.create(name='Course')
+        staff.save(update_fields=['phone'])
+        self.assertEqual(staff.changed_fields(), ['course_id'])
+        staff.save()
+        self.assertEqual(staff.changed_fields(), [])
@@ -31,12 +31,18 @@ urlpatterns = [
     path("data-tools/", hod_views.data_tools, name='data_tools'),
     path("data-tools/export/", hod_views.export_users_csv, name='export_users_csv'),
     path("data-tools/import/", hod_views.import_users_csv, name='import_users_csv'),
+    path("data-tools/import/<int:job_id>/", hod_views.import_job_status, name='import_job_status'),
+    path("data-tools/import/<int:job_id>/errors.csv", hod_views.import_job_errors, name='import_job_errors'),
     # path("staff/add", hod_views.add_staff, name='add_staff'),
     path("course/add", hod_views.add_course, name='add_course'),
     path("send_student_notification/", hod_views.send_student_notification,
          name='send_student_notification'),
     path("send_staff_notification/", hod_views.send_staff_notification,
          name='send_staff_notification'),
+    path("notify/broadcast/", hod_views.send_broadcast_notification,
+         name='send_broadcast_notification'),
+    path("notify/broadcast/<int:broadcast_id>/", hod_views.broadcast_progress,
+         name='broadcast_progress'),
     path("add_session/", hod_views.add_session, name='add_session'),
     path("notify/users/", hod_views.admin_notify_users,
          name='admin_notify_users'),
@@ -102,7 +108,7 @@ urlpatterns = [
          name='get_student_attendance'),
     path("staff/attendance/save/",
          staff_views.save_attendance, name='save_attendance'),
-    path("staff/attendance/update/",
+    path("staff/attendance/update/save/",
          staff_views.update_attendance, name='update_attendance'),
     path("staff/fcmtoken/", staff_views.staff_fcmtoken, name='staff_fcmtoken'),
     path("staff/view/notification/", staff_views.staff_view_notification,
@@ -137,6 +143,7 @@ urlpatterns = [
     path('api/notifications/<int:notification_id>/read/', notification_views.mark_notification_read, name='mark_notification_read'),
     path('api/notifications/mark-all-read/', notification_views.mark_all_notifications_read, name='mark_all_notifications_read'),
     path('api/notifications/count/', notification_views.get_notification_count, name='get_notification_count'),
+    path('api/notifications/stream/', notification_views.notification_stream, name='notification_stream'),
     
     # Notification widget endpoints
     path('api/notifications/html/', notification_views.get_user_notifications_html, name='get_user_notifications_html'),
@@ -0,0 +1,283 @@
+# main_app/user_import.py
+"""Bulk import of users from the CSV upload on the data tools page.
+
+The whole file is validated against lookups loaded up front (existing emails
+and ID numbers, courses, sessions), then the valid rows are written with
+bulk_create in chunks, each committed on its own (import_jobs runs the
+imports). bulk_create sends no signals, so the profile rows, ID numbers and
+cache invalidation the post_save receivers would have handled are done here,
+once per import.
+"""
+import csv
+import io
+
+from django.db import transaction
+from django.utils.crypto import get_random_string
+
+from .models import Admin, Course, CustomUser, Session, Staff, Student, allocate_ids
+from .password_hashing import hash_passwords
+
+ADMIN_ROLE = '1'
+STAFF_ROLE = '2'
+STUDENT_ROLE = '3'
+IMPORT_CHUNK_SIZE = 500
+LOOKUP_CHUNK_SIZE = 1000  # values per IN (...) when checking existing rows
+
+CSV_REQUIRED_FIELDS = {'first_name', 'last_name', 'email', 'gender', 'address'}
+CSV_HEADER_ALIASES = {
+    'first_name': {'first_name', 'firstname', 'first name'},
+    'last_name': {'last_name', 'lastname', 'last name'},
+    'email': {'email', 'email address', 'email_address'},
+    'gender': {'gender', 'sex'},
+    'address': {'address', 'home_address', 'home address'},
+    'course': {'course', 'course_name', 'course name', 'courseid', 'course id'},
+    'session': {'session', 'session_year', 'session year', 'sessionid', 'session id'},
+    'password': {'password', 'pass', 'temp_password'},
+    'profile_pic': {'profile_pic', 'profile picture', 'avatar', 'photo', 'profilepic'},
+}
+
+# role -> (profile model, ID field, generated prefix)
+PROFILES = {
+    ADMIN_ROLE: (Admin, 'admin_id_number', 'ADM'),
+    STAFF_ROLE: (Staff, 'staff_id_number', 'STF'),
+    STUDENT_ROLE: (Student, 'registration_number', 'REG'),
+}
+
+
+class CSVHeaderError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.errors = []  # (line number, message)
+
+    def error_lines(self):
+        return [f"Line {line}: {message}" for line, message in self.errors]
+
+
+def _normalize_gender(value):
+    if not value:
+        return None
+    normalized = value.strip().upper()
+    if normalized.startswith('M'):
+        return 'M'
+    if normalized.startswith('F'):
+        return 'F'
+    return None
+
+
+def _canonicalize_header(name):
+    key = (name or '').strip().lower()
+    if not key:
+        return key
+    for canonical, aliases in CSV_HEADER_ALIASES.items():
+        if key == canonical or key in aliases:
+            return canonical
+    return key
+
+
+def is_password_header(name):
+    """True for the password column, under any of its aliases."""
+    return _canonicalize_header(name) == 'password'
+
+
+def read_rows(text):
+    """Yield (line number, row dict) with canonical column names from CSV text."""
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames:
+        reader.fieldnames = [_canonicalize_header(name) for name in reader.fieldnames]
+    header_set = set(reader.fieldnames or [])
+    if not header_set or not CSV_REQUIRED_FIELDS.issubset(header_set):
+        raise CSVHeaderError(
+            "CSV header must include first_name,last_name,email,gender,address "
+            "(plus course/session/password/profile_pic where needed)."
+        )
+    for line_number, row in enumerate(reader, start=2):
+        if row and any(row.values()):
+            yield line_number, row
+
+
+def _clean(row, key):
+    return (row.get(key) or '').strip()
+
+
+def _existing(model, field, values):
+    """The subset of `values` already stored in model.field."""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        found.update(model.objects.filter(
+            **{f'{field}__in': values[start:start + LOOKUP_CHUNK_SIZE]}).values_list(field, flat=True))
+    return found
+
+
+class Lookups:
+    """Courses and sessions by every spelling the CSV accepts; first match by id wins."""
+
+    def __init__(self):
+        self.courses_by_id, self.courses_by_name = {}, {}
+        for course in Course.objects.order_by('id'):
+            self.courses_by_id[course.id] = course
+            self.courses_by_name.setdefault(course.name.strip().lower(), course)
+        self.sessions_by_id, self.sessions_by_years = {}, {}
+        for session in Session.objects.order_by('id'):
+            start, end = session.start_year.year, session.end_year.year
+            self.sessions_by_id[session.id] = session
+            self.sessions_by_years.setdefault((start, end), session)
+            self.sessions_by_years.setdefault((start,), session)
+
+    def course(self, value):
+        if not value:
+            return None
+        if value.isdigit():
+            return self.courses_by_id.get(int(value))
+        return self.courses_by_name.get(value.lower())
+
+    def session(self, value):
+        if not value:
+            return None
+        if value.isdigit():
+            return self.sessions_by_id.get(int(value))
+        parts = [part.strip() for part in value.replace('/', '-').split('-') if part.strip()]
+        if 1 <= len(parts) <= 2 and all(part.isdigit() for part in parts):
+            return self.sessions_by_years.get(tuple(int(part) for part in parts))
+        return None
+
+
+def validate_rows(role, rows, result):
+    """Check every row before anything is written; returns the rows to create.
+
+    Rows whose email already exists (or repeats an earlier row) are skipped,
+    invalid rows are recorded in result.errors.
+    """
+    rows = list(rows)
+    _, id_field, _ = PROFILES[role]
+    emails = {_clean(row, 'email').lower() for _, row in rows}
+    taken_emails = _existing(CustomUser, 'email', emails)
+    taken_ids = _existing(PROFILES[role][0], id_field, {_clean(row, id_field) for _, row in rows} - {''})
+    lookups = Lookups()
+
+    valid = []
+    for line_number, row in rows:
+        email = _clean(row, 'email').lower()
+        first_name = _clean(row, 'first_name')
+        last_name = _clean(row, 'last_name')
+        gender = _normalize_gender(row.get('gender'))
+        address = _clean(row, 'address')
+        id_number = _clean(row, id_field)
+
+        if not email or not first_name or not last_name or not gender or not address:
+            result.errors.append((line_number, "Missing one of the required fields (first_name,last_name,email,gender,address)."))
+            continue
+        if email in taken_emails:
+            result.skipped += 1
+            continue
+
+        course = session = None
+        if role in (STAFF_ROLE, STUDENT_ROLE):
+            course = lookups.course(_clean(row, 'course'))
+            if not course:
+                result.errors.append((line_number, "Course column is required for this role and must match an existing course."))
+                continue
+        if role == STUDENT_ROLE:
+            session = lookups.session(_clean(row, 'session'))
+            if not session:
+                result.errors.append((line_number, "Session column is required for students and must match an existing session (e.g. 2022-2023)."))
+                continue
+            if not id_number:
+                result.errors.append((line_number, "Registration number is required for students."))
+                continue
+        if role == STAFF_ROLE and not id_number:
+            result.errors.append((line_number, "Staff ID number is required for staff."))
+            continue
+        if id_number and id_number in taken_ids:
+            result.errors.append((line_number, f"{id_number} is already in use."))
+            continue
+
+        taken_emails.add(email)
+        if id_number:
+            taken_ids.add(id_number)
+        valid.append({
+            'email': email,
+            'first_name': first_name,
+            'last_name': last_name,
+            'gender': gender,
+            'address': address,
+            'phone': _clean(row, 'phone'),
+            'password': _clean(row, 'password') or get_random_string(12),
+            'profile_pic': _clean(row, 'profile_pic'),
+            'id_number': id_number,
+            'course': course,
+            'session': session,
+        })
+    return valid
+
+
+def _build_user(role, row, password_hash):
+    user = CustomUser(
+        email=row['email'],
+        first_name=row['first_name'],
+        last_name=row['last_name'],
+        gender=row['gender'],
+        address=row['address'],
+        user_type=role,
+        password=password_hash,
+    )
+    if row['profile_pic']:
+        user.profile_pic = row['profile_pic']
+    return user
+
+
+def _build_profile(role, user, row):
+    model, id_field, _ = PROFILES[role]
+    profile = model(admin=user, **{id_field: row['id_number'] or None})
+    if role != ADMIN_ROLE:
+        profile.phone = row['phone']
+        profile.course = row['course']
+    if role == STUDENT_ROLE:
+        profile.session = row['session']
+    return profile
+
+
+def create_rows(role, valid, chunk_size=IMPORT_CHUNK_SIZE, on_chunk=None):
+    """bulk_create users and their profiles; returns the number created.
+
+    Passwords are hashed in a process pool and each chunk is inserted as soon
+    as its hashes are ready. Every chunk is atomic: a savepoint when called
+    inside a transaction, its own commit otherwise. on_chunk(created_so_far)
+    runs inside the chunk's transaction.
+    """
+    model, id_field, prefix = PROFILES[role]
+    missing = [row for row in valid if not row['id_number']]
+    typed = {row['id_number'] for row in valid if row['id_number']}
+    for row, id_number in zip(missing, allocate_ids(prefix, len(missing), reserved=typed)):
+        row['id_number'] = id_number
+
+    hashes = hash_passwords(row['password'] for row in valid)
+    created = 0
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        users = [_build_user(role, row, next(hashes)) for row in chunk]
+        with transaction.atomic():
+            CustomUser.objects.bulk_create(users)
+            model.objects.bulk_create([_build_profile(role, user, row) for user, row in zip(users, chunk)])
+            created += len(chunk)
+            if on_chunk:
+                on_chunk(created)
+    return created
+
+
+def invalidate_caches(role):
+    """Drop the dashboard stats and the chat answers built from the roster.
+
+    Called from process_imports as well, so it relies on the default cache
+    being shared with the web processes (see CACHES, check main_app.W001).
+    """
+    from .chat_cache import topic_changed
+    from .dashboard_stats import invalidate_dashboard_stats
+
+    transaction.on_commit(invalidate_dashboard_stats)
+    topic_changed('roster' if role == STUDENT_ROLE else 'academic')